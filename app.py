@@ -7,8 +7,15 @@ import numpy as np
 import pandas as pd
 import altair as alt
 import time
+import os
+import multiprocessing
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from types import SimpleNamespace
 
-from model import FarmConfig, FarmModel, SCENARIOS, BASE_SCENARIO
+from model import FarmConfig, FarmModel, SCENARIOS, BASE_SCENARIO, MC_SUMMARY_SCHEMA, MC_QUARTERLY_COLS, quarter_ends, AGE_CATEGORIES, run_mc_task, DEFAULT_COOLING_ENERGY_PER_KG
 
 # --- CONFIGURATION ---
 # Nastavení stránky (titulek, ikona, rozložení na celou šířku).
@@ -20,6 +27,196 @@ st.set_page_config(page_title="Ovčí farma - Systémová dynamika", layout="wid
 if 'custom_scenarios' not in st.session_state:
     st.session_state['custom_scenarios'] = {}
 
+# --- CACHED HELPERS ---
+# st.cache_resource: Jeden objekt sdílený všemi relacemi (vlákny) aplikace.
+# Výsledky jednotlivých běhů MC podle klíče (scénář, parametry, seed, citlivost).
+# Stejný běh se při dalším spuštění nepočítá znovu, i když se změní jen část scénářů
+# (např. přepnutí nákladů práce přepočítá jen dotčené scénáře, ostatní jdou z cache).
+# Slovník sdílí všechny relace, proto čtení, zápis i zahazování probíhá jen pod zámkem.
+# Velikost je omezena paměťovým rozpočtem MC_CACHE_MAX_BYTES (nejstarší záznamy se zahazují):
+# záznam = kvartální blok float32 (kvartály x len(MC_QUARTERLY_COLS) x 4 B, pro 5 let 400 B)
+# + souhrn běhu a klíč (dict s ~18 numpy skaláry, změřeno ~1,5 kB). Cache tak nikdy nezabere
+# víc než ~32 MiB (~17 000 běhů) bez ohledu na to, jak dlouho aplikace běží.
+MC_CACHE_MAX_BYTES = 32 * 1024 * 1024
+MC_CACHE_ENTRY_BYTES = len(quarter_ends(5 * 365)[0]) * len(MC_QUARTERLY_COLS) * 4 + 1536
+MC_CACHE_MAX_ENTRIES = MC_CACHE_MAX_BYTES // MC_CACHE_ENTRY_BYTES
+
+@st.cache_resource
+def _get_mc_result_cache():
+    return OrderedDict(), threading.Lock()
+
+# st.cache_resource: Jeden sdílený pool procesů pro celou aplikaci (nevytváří se při každém spuštění).
+# Odpadá tak režie startu workerů při každém kliknutí na "Spustit simulaci".
+# Workery startují přes "forkserver": fork celého vícevláknového serveru Streamlitu může uváznout.
+# Když pool spadne (BrokenProcessPool), smyčka MC ho vymění přes _replace_broken_executor.
+@st.cache_resource
+def _get_mc_executor():
+    return ProcessPoolExecutor(mp_context=multiprocessing.get_context("forkserver"))
+
+# Zámek pro výměnu sdíleného poolu (sdílený všemi relacemi, proto také st.cache_resource)
+@st.cache_resource
+def _get_mc_executor_lock():
+    return threading.Lock()
+
+def _replace_broken_executor(old):
+    """
+    Ukončí rozbitý pool (uvolní vlákno správce i případné přeživší workery) a vrátí funkční.
+    Rozbití vidí všechny relace, které na poolu právě počítaly; z cache ho proto odstraníme,
+    jen pokud tam pořád je - jinak by jedna relace zahodila nový pool, který už vytvořila jiná.
+    """
+    old.shutdown(wait=False, cancel_futures=True)
+    with _get_mc_executor_lock():
+        if _get_mc_executor() is old:
+            _get_mc_executor.clear()
+        return _get_mc_executor()
+
+# st.cache_data: Výsledek funkce se uloží do paměti podle hodnot argumentů.
+# Jednotlivá simulace: stejná konfigurace + seed (např. po změně jen zobrazení) se nepočítá znovu.
+# Vedle denního DataFrame vracíme jen logy modelu, které dashboard čte (ne celý objekt FarmModel).
+@st.cache_data(max_entries=32, show_spinner=False)
+def _run_single_sim(cfg_kwargs, seed):
+    model = FarmModel(FarmConfig(**cfg_kwargs), seed=seed)
+    df = model.run()
+    logs = SimpleNamespace(feed_log=model.feed_log, event_log=model.render_event_log(),
+                           yearly_age_snapshots=model.yearly_age_snapshots)
+    return df, logs
+
+# OPTIMALIZACE: Týdenní agregace a dlouhé tabulky (melt) pro grafy stáda a BCS závisí jen na vstupech
+# simulace. Klíčem cache jsou stejné malé argumenty jako u _run_single_sim (ne hash denního DataFrame),
+# takže při překreslení stránky se stejnými vstupy se resample ani melt znovu nepočítají.
+@st.cache_data(max_entries=32, show_spinner=False)
+def _weekly_views(cfg_kwargs, seed):
+    df, _ = _run_single_sim(cfg_kwargs, seed)
+    # Grafy stavových veličin (stádo, seno, BCS, pastvina, admin) kreslíme z týdenních hodnot -
+    # cca 7x méně bodů pro Vega. Stavy bereme ke konci týdne, denní sazby jako průměr týdne.
+    df_weekly = df.resample("W").agg({
+        "Ewes": "last", "Lambs Male": "last", "Lambs Female": "last", "Hay Stock": "last", "Total Animals": "last",
+        "BCS": "mean", "Perceived_BCS": "mean", "Pasture_Health": "mean", "Exp_Admin": "mean"
+    }).reset_index()
+    df_herd_melt = df_weekly.melt(id_vars='Date', value_vars=['Ewes', 'Lambs Male', 'Lambs Female'], var_name='Kategorie', value_name='Počet')
+    bcs_melt = df_weekly.melt(id_vars='Date', value_vars=['BCS', 'Perceived_BCS'], var_name='Typ', value_name='Hodnota')
+    return df_weekly, df_herd_melt, bcs_melt
+
+# Tabulka rizika podle scénářů. Mění se jen po novém spuštění simulace, proto se počítá jednou
+# na jeho konci a ukládá do mc_results (cache_data by při každém překreslení hashovala celý souhrn).
+def _risk_agg(df_summary):
+    return df_summary.groupby("Scénář", observed=True).agg(
+        Riziko_Bankrotu=("Bankrot", "mean"),
+        Průměr_Min_BCS=("Min BCS", "mean"),
+        Průměr_Zisk=("Zisk (Kč)", "mean"),
+        Počet_Ovcí_Start=("Počet Ovcí (Start)", "first"), # Constant per scenario
+        Plocha=("Plocha (ha)", "first")
+    ).reset_index()
+
+# Pásma spolehlivosti: metriky kvartálních dat a přípony sloupců výsledné tabulky
+CI_METRICS = {"Cash": "Cash", "BCS": "BCS", "Pasture Health": "Pas"}
+
+def _ci_from_runs(sc_name, q_dates, block):
+    """
+    Průměr a 5./95. percentil přes běhy jednoho scénáře pro každý kvartál.
+    block je matice (běhy x kvartály x MC_QUARTERLY_COLS).
+    """
+    ci = {"Scénář": np.full(len(q_dates), sc_name, dtype=object), "Datum": q_dates}
+    q05, q95 = np.percentile(block, [5, 95], axis=0)
+    means = block.mean(axis=0)
+    for col, suffix in CI_METRICS.items():
+        j = list(MC_QUARTERLY_COLS).index(col)
+        ci[f"Mean_{suffix}"] = means[:, j]
+        ci[f"Min_{suffix}"] = q05[:, j]
+        ci[f"Max_{suffix}"] = q95[:, j]
+    return pd.DataFrame(ci)
+
+# CSV pro tlačítka ke stažení se staví jen jednou pro daná data, ne při každém překreslení.
+# Tlačítka dostávají funkci (lambda), takže se CSV vytvoří až po kliknutí na stažení.
+# Formát souborů zůstává beze změny (df.to_csv), uživatelé na něj mohou mít navázané další zpracování.
+@st.cache_data(show_spinner=False)
+def _to_csv_bytes(df, index=False):
+    return df.to_csv(index=index).encode('utf-8')
+
+# Detailní graf "Všechny běhy" kreslí jednu čáru na běh; při tisících běhů je prohlížeč
+# hlavní brzdou. Vykreslíme jen reprezentativní vzorek seedů (stejný pro všechny scénáře,
+# scénáře sdílí seedy), pásma spolehlivosti se dál počítají z kompletních dat.
+# Vzorek se losuje jednou při simulaci (mc_results['detail_seeds']), graf jen filtruje přes isin.
+MAX_LINES_PER_SCENARIO = 50
+
+# OPTIMALIZACE: Grafy vývoje v čase a citlivosti v MC mají pevnou strukturu, proto je skládáme
+# přímo jako Vega-Lite slovník pro st.vega_lite_chart. Odpadá stavba a validace objektů Altairu
+# (desítky ms na graf při každém překreslení fragmentu); do grafu jde jen potřebná část dat.
+def _mc_runs_spec(df_plot, y, y_title, title, opacity_val, y_scale=None):
+    """Čára pro každý běh (Seed), barva podle scénáře; kliknutím na legendu se scénář zvýrazní."""
+    y_enc = {"field": y, "type": "quantitative", "title": y_title}
+    if y_scale:
+        y_enc["scale"] = y_scale
+    return {
+        "data": {"values": df_plot[["Scénář", "Seed", "Datum", y]]},
+        "mark": {"type": "line"},
+        "params": [{"name": "scenario_sel", "select": {"type": "point", "fields": ["Scénář"]}, "bind": "legend"}],
+        "encoding": {
+            "x": {"field": "Datum", "type": "temporal", "title": "Čas"},
+            "y": y_enc,
+            "color": {"field": "Scénář", "type": "nominal"},
+            "detail": {"field": "Seed", "type": "nominal"},
+            "opacity": {"condition": {"param": "scenario_sel", "value": opacity_val}, "value": 0.005},
+            "tooltip": [
+                {"field": "Scénář", "type": "nominal"},
+                {"field": "Seed", "type": "quantitative"},
+                {"field": "Datum", "type": "temporal"},
+                {"field": y, "type": "quantitative"}
+            ]
+        },
+        "title": title,
+        "height": 300
+    }
+
+def _mc_ci_spec(ci_agg, y_mean, y_min, y_max, title, y_title):
+    """Pásmo 5.-95. percentilu (plocha) a průměr (čára) pro každý scénář."""
+    x_enc = {"field": "Datum", "type": "temporal", "title": "Čas"}
+    color_enc = {"field": "Scénář", "type": "nominal"}
+    return {
+        "data": {"values": ci_agg[["Scénář", "Datum", y_mean, y_min, y_max]]},
+        "layer": [
+            {"mark": {"type": "area", "opacity": 0.3},
+             "encoding": {"x": x_enc, "color": color_enc,
+                          "y": {"field": y_min, "type": "quantitative", "title": y_title},
+                          "y2": {"field": y_max}}},
+            {"mark": {"type": "line", "size": 3},
+             "encoding": {"x": x_enc, "color": color_enc,
+                          "y": {"field": y_mean, "type": "quantitative"}}}
+        ],
+        "title": title,
+        "height": 300
+    }
+
+def _sens_facet_spec(df_summary, labels):
+    """
+    Zisk běhu proti hodnotám citlivostních parametrů - jeden graf rozdělený na panely (facet)
+    po třech vedle sebe; každý panel má vlastní osu x (parametry mají různé rozsahy).
+    Data jdou do prohlížeče jednou v dlouhém tvaru (Parametr, Hodnota).
+    """
+    df_long = df_summary[["Scénář", "Skupina", "Zisk (Kč)", *labels]].melt(
+        id_vars=["Scénář", "Skupina", "Zisk (Kč)"], value_vars=labels, var_name="Parametr", value_name="Hodnota")
+    return {
+        "data": {"values": df_long},
+        "facet": {"field": "Parametr", "type": "nominal", "sort": list(labels), "title": None},
+        "columns": 3,
+        "spec": {
+            "mark": {"type": "circle", "size": 60, "opacity": 0.5},
+            "encoding": {
+                "x": {"field": "Hodnota", "type": "quantitative", "title": None, "scale": {"zero": False}},
+                "y": {"field": "Zisk (Kč)", "type": "quantitative", "title": "Zisk"},
+                "color": {"field": "Skupina", "type": "nominal"},
+                "tooltip": [
+                    {"field": "Scénář", "type": "nominal"},
+                    {"field": "Parametr", "type": "nominal"},
+                    {"field": "Hodnota", "type": "quantitative"},
+                    {"field": "Zisk (Kč)", "type": "quantitative"}
+                ]
+            },
+            "width": 300
+        },
+        "resolve": {"scale": {"x": "independent"}}
+    }
+
 # --- SIDEBAR UI ---
 # 'with st.sidebar:' definuje blok kódu, který vykreslí prvky do levého panelu.
 with st.sidebar:
@@ -32,9 +229,15 @@ with st.sidebar:
     # Placeholder for Save Scenario UI (to be rendered after inputs are defined)
     save_sc_container = st.container()
     
+    # --- CONFIG FORM ---
+    # st.form: Změny widgetů uvnitř formuláře nespouští přepočet hned, ale až po stisku "Přepočítat".
+    # Záložky vytvoříme uvnitř formuláře, takže i všechny widgety v nich patří do formuláře.
+    cfg_form = st.form("cfg", clear_on_submit=False, border=False)
+    
     # --- TABS FOR BETTER UI ORGANIZATION ---
     # Rozdělení nastavení do záložek pro přehlednost.
-    tab_main, tab_strat, tab_details = st.tabs(["Základ", "Strategie", "Detaily"])
+    with cfg_form:
+        tab_main, tab_strat, tab_details = st.tabs(["Základ", "Strategie", "Detaily"])
     
     with tab_main:
         # st.slider: Vytvoří posuvník. Vrací hodnotu, kterou uživatel vybral.
@@ -50,7 +253,9 @@ with st.sidebar:
         meadow_pct = st.slider("Podíl luk na seno (%)", 0, 100, 40, help="Část plochy jen na výrobu sena (pastva zakázana)")
         
         st.header("2. Stádo a ekonomika")
-        start_ewes = st.slider("Počet bahnic (start)", 1, target_ewes, min(20, target_ewes), help="Kolik ovcí nakoupíte do začátku.")
+        # Rozsah nezávisí na kapacitě výše - ve formuláři by se změna kapacity projevila až po odeslání.
+        # Dvojici kontrolujeme po odeslání formuláře (viz níže).
+        start_ewes = st.slider("Počet bahnic (start)", 1, 500, 20, help="Kolik ovcí nakoupíte do začátku. Nejvýše cílová kapacita ovčína.")
         meat_price = st.slider("Maloobchodní cena (Ze dvora) Kč/kg", 60.0, 150.0, 85.0, help="Cena pro lokální prodej (ze dvora).")
         start_hay = st.number_input("Počáteční zásoba sena (balíky)", 0, 500, 25)
         cap = st.number_input("Počáteční kapitál (Kč)", value=200000)
@@ -64,9 +269,16 @@ with st.sidebar:
         if 'rain_val' not in st.session_state: st.session_state['rain_val'] = 100
         if 'drought_val' not in st.session_state: st.session_state['drought_val'] = 0.5
         if 'winter_val' not in st.session_state: st.session_state['winter_val'] = 100
+        if 'climate_applied' not in st.session_state: st.session_state['climate_applied'] = "Normální"
 
-        def update_climate_preset():
+        # Uvnitř st.form smí mít callback jen tlačítko pro odeslání, proto se profil na posuvníky
+        # přenese až při odeslání formuláře - a jen když se profil od posledního odeslání změnil,
+        # aby ruční úpravy posuvníků zůstaly zachovány.
+        def apply_climate_preset():
             sel = st.session_state.climate_selector
+            if sel == st.session_state.climate_applied:
+                return
+            st.session_state.climate_applied = sel
             if sel == "Normální":
                 st.session_state.rain_val, st.session_state.drought_val, st.session_state.winter_val = 100, 0.5, 100
             elif sel == "Suchý":
@@ -74,8 +286,8 @@ with st.sidebar:
             elif sel == "Horský":
                 st.session_state.rain_val, st.session_state.drought_val, st.session_state.winter_val = 120, 0.1, 130
 
-        # st.selectbox: Rozbalovací menu. on_change spustí funkci update_climate_preset při změně.
-        st.selectbox("Klimatický profil (Přednastavení)", ["Normální", "Suchý", "Horský"], key="climate_selector", on_change=update_climate_preset, help="Nastaví posuvníky níže na typické hodnoty pro danou oblast.")
+        # st.selectbox: Rozbalovací menu. Profil se projeví po stisku "Přepočítat".
+        st.selectbox("Klimatický profil (Přednastavení)", ["Normální", "Suchý", "Horský"], key="climate_selector", help="Po přepočítání nastaví posuvníky níže na typické hodnoty pro danou oblast.")
         climate = "UI_Custom" # Pro UI používáme tento speciální profil, který se řídí čistě posuvníky
         
         machinery_map = {"Služby": "Services", "Vlastní": "Own"}
@@ -128,7 +340,7 @@ with st.sidebar:
             p_freezer_cap = st.number_input("Kapacita mrazáku (kg)", 100.0, 5000.0, 500.0, 50.0)
             p_freezer_capex = st.number_input("Cena mrazáku (Kč)", 5000.0, 200000.0, 30000.0, 1000.0)
             p_elec_price = st.number_input("Cena elektřiny (Kč/kWh)", 1.0, 20.0, 6.0, 0.5)
-            p_elec_usage = st.number_input("Spotřeba chlazení (kWh/kg/den)", 0.001, 0.5, FarmConfig.cooling_energy_per_kg, 0.001)
+            p_elec_usage = st.number_input("Spotřeba chlazení (kWh/kg/den)", 0.001, 0.5, DEFAULT_COOLING_ENERGY_PER_KG, 0.001)
 
         with st.expander("Dotace a Daně"):
             sub_ha = st.number_input("SAPS (Kč/ha)", 0.0, 20000.0, 6000.0, 100.0)
@@ -148,6 +360,38 @@ with st.sidebar:
             maint_barn_m2 = st.number_input("Údržba budovy (Kč/m²/rok)", 0.0, 1000.0, 60.0, 10.0, help="Opravy střechy, nátěry, dezinfekce.")
             shock_p = st.number_input("Pravděpodobnost šoku (denní %)", 0.0, 5.0, 0.5, 0.1) / 100.0
 
+    with cfg_form:
+        st.form_submit_button("Přepočítat", type="primary", use_container_width=True, on_click=apply_climate_preset)
+
+    # Počáteční stádo nesmí překročit kapacitu ovčína (kontrola po odeslání formuláře).
+    if start_ewes > target_ewes:
+        st.warning(f"Počet bahnic na startu ({start_ewes}) převyšuje kapacitu ovčína ({target_ewes}). Simulace počítá s {target_ewes} bahnicemi.")
+        start_ewes = target_ewes
+
+    # Základní konfigurace ze vstupů v panelu - jediné místo, kde se slovník sestavuje.
+    # Používá ho uložení vlastního scénáře, Monte Carlo i jednotlivá simulace (dříve tři ručně udržované kopie).
+    base_kwargs = {
+        "sim_years": 5, "land_area": area, "meadow_share": meadow_pct/100.0, "barn_capacity": target_ewes,
+        "initial_ewes": start_ewes, "barn_area_m2": barn_m2, "hay_barn_area_m2": hay_barn_m2, "capital": cap,
+        "price_meat_avg": meat_price, "market_quota_kg": m_quota_kg, "price_meat_wholesale": m_wholesale,
+        "delay_bcs_perception": delay_bcs, "delay_feed_delivery": delay_mat, "initial_hay_bales": start_hay,
+        "include_labor_cost": labor_on,
+        "climate_profile": climate, "machinery_mode": machinery, "rain_growth_global_mod": rain_mod,
+        "drought_prob_add": drought_add, "winter_len_global_mod": winter_mod,
+        "fertility_mean": p_fertility, "mortality_lamb_mean": p_mortality_lamb, "mortality_ewe_mean": p_mortality_ewe,
+        "feed_intake_ewe": p_feed_ewe, "hay_yield_ha_mean": p_hay_yield, "cost_feed_own_mean": c_feed_own,
+        "cost_feed_market_mean": c_feed_market, "cost_vet_base": c_vet, "cost_shearing": c_shearing,
+        "price_ram_purchase": c_ram, "price_bale_sell_winter": c_bale_sell_winter, "price_bale_sell_summer": c_bale_sell_summer,
+        "service_mow_ha": s_mow_ha, "service_bale_pcs": s_bale, "own_machine_capex": o_capex, "own_mow_fuel_ha": o_fuel,
+        "machinery_repair_mean": o_repair, "subsidy_ha_mean": sub_ha, "subsidy_sheep_mean": sub_sheep,
+        "tax_land_ha": tax_land, "tax_building_m2": tax_build, "overhead_base_year": ov_base,
+        "barn_maintenance_m2_year": maint_barn_m2, "admin_base_cost": adm_base, "admin_complexity_factor": adm_factor,
+        "wage_hourly": wage, "labor_hours_per_ewe_year": labor_h, "labor_hours_per_ha_year": labor_ha,
+        "labor_hours_fix_year": labor_fix, "labor_hours_barn_m2_year": labor_barn_m2, "shock_prob_daily": shock_p,
+        "enable_freezing": use_freezing, "freezer_capacity_kg": p_freezer_cap, "freezer_capex": p_freezer_capex,
+        "electricity_price": p_elec_price, "cooling_energy_per_kg": p_elec_usage
+    }
+
     # --- SAVE SCENARIO UI ---
     with save_sc_container:
         # Logika pro uložení vlastního scénáře do paměti (session state).
@@ -158,27 +402,7 @@ with st.sidebar:
                 if new_sc_name:
                     # Vytvoříme konfiguraci na základě BASE_SCENARIO a přepíšeme ji aktuálními vstupy
                     custom_sc = BASE_SCENARIO.copy()
-                    custom_sc.update({
-                        "sim_years": 5, "land_area": area, "meadow_share": meadow_pct/100.0, "barn_capacity": target_ewes,
-                        "initial_ewes": start_ewes, "barn_area_m2": barn_m2, "hay_barn_area_m2": hay_barn_m2, "capital": cap,
-                        "price_meat_avg": meat_price, "market_quota_kg": m_quota_kg, "price_meat_wholesale": m_wholesale,
-                        "delay_bcs_perception": delay_bcs, "delay_feed_delivery": delay_mat, "initial_hay_bales": start_hay,
-                        "include_labor_cost": labor_on,
-                        "climate_profile": climate, "machinery_mode": machinery, "rain_growth_global_mod": rain_mod,
-                        "drought_prob_add": drought_add, "winter_len_global_mod": winter_mod,
-                        "fertility_mean": p_fertility, "mortality_lamb_mean": p_mortality_lamb, "mortality_ewe_mean": p_mortality_ewe,
-                        "feed_intake_ewe": p_feed_ewe, "hay_yield_ha_mean": p_hay_yield, "cost_feed_own_mean": c_feed_own,
-                        "cost_feed_market_mean": c_feed_market, "cost_vet_base": c_vet, "cost_shearing": c_shearing,
-                        "price_ram_purchase": c_ram, "price_bale_sell_winter": c_bale_sell_winter, "price_bale_sell_summer": c_bale_sell_summer,
-                        "service_mow_ha": s_mow_ha, "service_bale_pcs": s_bale, "own_machine_capex": o_capex, "own_mow_fuel_ha": o_fuel,
-                        "machinery_repair_mean": o_repair, "subsidy_ha_mean": sub_ha, "subsidy_sheep_mean": sub_sheep,
-                        "tax_land_ha": tax_land, "tax_building_m2": tax_build, "overhead_base_year": ov_base,
-                        "barn_maintenance_m2_year": maint_barn_m2, "admin_base_cost": adm_base, "admin_complexity_factor": adm_factor,
-                        "wage_hourly": wage, "labor_hours_per_ewe_year": labor_h, "labor_hours_per_ha_year": labor_ha, 
-                        "labor_hours_fix_year": labor_fix, "labor_hours_barn_m2_year": labor_barn_m2, "shock_prob_daily": shock_p,
-                        "enable_freezing": use_freezing, "freezer_capacity_kg": p_freezer_cap, "freezer_capex": p_freezer_capex,
-                        "electricity_price": p_elec_price, "cooling_energy_per_kg": p_elec_usage
-                    })
+                    custom_sc.update(base_kwargs)
                     
                     # Uložíme do session state s prefixem "C." (Custom)
                     st.session_state['custom_scenarios'][f"C. {new_sc_name}"] = custom_sc
@@ -234,170 +458,177 @@ if mode_switch == "Monte Carlo Laboratoř":
     
     # Tlačítko pro spuštění hromadné simulace.
     if st.button(f"Spustit simulaci ({len(active_scenarios) * n_runs} běhů)"):
-        run_summaries = []
-        quarterly_data = []
         progress_bar = st.progress(0)
-        status_text = st.empty()
+        # st.status: sbalitelný stavový box; popisek aktualizujeme jen omezeně často (viz níže).
+        status = st.status("Simuluji...", expanded=False)
         
         total_sims = len(active_scenarios) * n_runs
-        counter = 0
         
         start_time = time.time()
         
-        # Base config from sidebar inputs (as a baseline)
-        base_kwargs = {
-            "sim_years": 5, "land_area": area, "meadow_share": meadow_pct/100.0, "barn_capacity": target_ewes,
-            "initial_ewes": start_ewes, "barn_area_m2": barn_m2, "hay_barn_area_m2": hay_barn_m2, "capital": cap,
-            "price_meat_avg": meat_price, "market_quota_kg": m_quota_kg, "price_meat_wholesale": m_wholesale,
-            "delay_bcs_perception": delay_bcs, "delay_feed_delivery": delay_mat, "initial_hay_bales": start_hay,
-            "include_labor_cost": labor_on,
-            "climate_profile": climate, "machinery_mode": machinery, "rain_growth_global_mod": rain_mod,
-            "drought_prob_add": drought_add, "winter_len_global_mod": winter_mod,
-            "fertility_mean": p_fertility, "mortality_lamb_mean": p_mortality_lamb, "mortality_ewe_mean": p_mortality_ewe,
-            "feed_intake_ewe": p_feed_ewe, "hay_yield_ha_mean": p_hay_yield, "cost_feed_own_mean": c_feed_own,
-            "cost_feed_market_mean": c_feed_market, "cost_vet_base": c_vet, "cost_shearing": c_shearing,
-            "price_ram_purchase": c_ram, "price_bale_sell_winter": c_bale_sell_winter, "price_bale_sell_summer": c_bale_sell_summer,
-            "service_mow_ha": s_mow_ha, "service_bale_pcs": s_bale, "own_machine_capex": o_capex, "own_mow_fuel_ha": o_fuel,
-            "machinery_repair_mean": o_repair, "subsidy_ha_mean": sub_ha, "subsidy_sheep_mean": sub_sheep,
-            "tax_land_ha": tax_land, "tax_building_m2": tax_build, "overhead_base_year": ov_base,
-            "barn_maintenance_m2_year": maint_barn_m2, "admin_base_cost": adm_base, "admin_complexity_factor": adm_factor,
-            "wage_hourly": wage, "labor_hours_per_ewe_year": labor_h, "labor_hours_per_ha_year": labor_ha,
-            "labor_hours_fix_year": labor_fix, "labor_hours_barn_m2_year": labor_barn_m2, "shock_prob_daily": shock_p,
-            "enable_freezing": use_freezing, "freezer_capacity_kg": p_freezer_cap, "freezer_capex": p_freezer_capex,
-            "electricity_price": p_elec_price, "cooling_energy_per_kg": p_elec_usage
-        }
         config_fields = set(FarmConfig.__dataclass_fields__.keys())
-
+        # Filtr na pole FarmConfig uděláme jednou pro základ, u scénářů už jen pro jejich malou "deltu".
+        base_kwargs = {k: v for k, v in base_kwargs.items() if k in config_fields}
+
+        # 1) Sestavíme plochý seznam úloh (scénář, seed). Každý běh je nezávislý,
+        #    takže je můžeme rozeslat na všechna jádra CPU.
+        tasks = []
+        task_keys = []
+        # Citlivostní faktory losujeme najednou jako matici (n_runs x počet parametrů) z vlastního generátoru.
+        # Řádek i tak platí pro Seed i ve všech scénářích (model má vlastní generátor podle seedu).
+        sens_rng = np.random.default_rng(sim_seed)
+        sens_factors = sens_rng.uniform(1.0 - sens_range_pct, 1.0 + sens_range_pct, size=(n_runs, len(sens_selection)))
+        # Seedy běhů odvodíme přes SeedSequence.spawn: nezávislé proudy náhody místo po sobě
+        # jdoucích čísel sim_seed + i. Běh i má stejný seed ve všech scénářích.
+        run_seeds = [int(child.generate_state(1)[0]) for child in np.random.SeedSequence(sim_seed).spawn(n_runs)]
         for sc_name, sc_params in active_scenarios.items():
-            # Merge base config with scenario overrides
-            run_kwargs = base_kwargs.copy()
-            run_kwargs.update(sc_params)
+            sc_delta = dict(sc_params)
+            
+            # Normalize legacy scenario key (market_local_limit -> market_quota_kg)
+            if "market_local_limit" in sc_delta:
+                legacy_quota = sc_delta.pop("market_local_limit")
+                sc_delta["market_quota_kg"] = sc_delta.get("market_quota_kg", base_kwargs.get("market_quota_kg", legacy_quota))
+            
+            # Merge base config with scenario overrides (unexpected keys removed before FarmConfig(**kwargs))
+            sc_delta = {k: v for k, v in sc_delta.items() if k in config_fields}
+            run_kwargs = {**base_kwargs, **sc_delta}
             
             # Apply Labor Override
             if labor_override == "Vše ZAPNUTO":
                 run_kwargs["include_labor_cost"] = True
             elif labor_override == "Vše VYPNUTO":
                 run_kwargs["include_labor_cost"] = False
-            
-            # Normalize legacy scenario key (market_local_limit -> market_quota_kg)
-            if "market_local_limit" in run_kwargs:
-                run_kwargs["market_quota_kg"] = run_kwargs.get("market_quota_kg", run_kwargs["market_local_limit"])
-                run_kwargs.pop("market_local_limit", None)
-            
-            # Remove any unexpected keys before FarmConfig(**kwargs)
-            run_kwargs = {k: v for k, v in run_kwargs.items() if k in config_fields}
+            # Klíč cache běhu: název scénáře (je ve výsledku) + seřazené parametry; sestaví se jednou na scénář
+            sc_key = (sc_name, tuple(sorted(run_kwargs.items())), tuple(sens_selection))
             
             for i in range(n_runs):
-                # Random seed for each run
                 # Pro každý běh nastavíme unikátní seed, ale konzistentní napříč scénáři.
                 # FIX: Consistent seeds across scenarios (Seed 0 is always Seed 0)
-                current_seed = sim_seed + i
-                np.random.seed(current_seed) 
-                
-                # Sensitivity Perturbation (Per Run)
-                current_run_kwargs = run_kwargs.copy()
-                sens_log = {}
-                
-                if sensitivity_on and sens_selection:
-                    for label in sens_selection:
-                        key = sens_map[label]
-                        factor = np.random.uniform(1.0 - sens_range_pct, 1.0 + sens_range_pct)
-                        
-                        if key == "price_bale_sell_winter":
-                            current_run_kwargs["price_bale_sell_winter"] *= factor
-                            current_run_kwargs["price_bale_sell_summer"] *= factor
-                            sens_log[label] = current_run_kwargs["price_bale_sell_winter"]
-                        elif key == "market_quota_kg":
-                            current_run_kwargs[key] = current_run_kwargs[key] * factor
-                            sens_log[label] = current_run_kwargs[key]
-                        else:
-                            current_run_kwargs[key] *= factor
-                            sens_log[label] = current_run_kwargs[key]
-                
-                # RE-SEED: Zajistíme, že stochastika modelu (počasí, ceny) bude identická
-                # pro daný Seed, bez ohledu na to, zda jsme "spotřebovali" náhodu pro citlivostní analýzu.
-                np.random.seed(current_seed)
-                
-                # Create config object
-                mc_cfg = FarmConfig(**current_run_kwargs)
-                
-                # Spuštění modelu
-                mc_model = FarmModel(mc_cfg)
-                mc_df = mc_model.run()
-                
-                # --- 1. RUN SUMMARY (Agregace za celý běh) ---
-                profit = mc_df["Cash"].iloc[-1] - mc_cfg.capital
-                is_bankrupt = 1 if mc_df["Cash"].iloc[-1] < 0 else 0
-                
-                total_labor = mc_df["Labor Hours"].sum()
-                efficiency = profit / max(1.0, total_labor)
-                
-                summary_row = {
-                    "Scénář": sc_name,
-                    "Skupina": sc_name[0],
-                    "Seed": current_seed,
-                    "Počet Ovcí (Start)": mc_cfg.initial_ewes,
-                    "Plocha (ha)": mc_cfg.land_area,
-                    "Zisk (Kč)": profit,
-                    "Efektivita (Kč/h)": efficiency,
-                    "Konečný Cash": mc_df["Cash"].iloc[-1],
-                    "Bankrot": is_bankrupt,
-                    "Min BCS": mc_df["BCS"].min(),
-                    "Max BCS": mc_df["BCS"].max(),
-                    "Průměr BCS": mc_df["BCS"].mean(),
-                    "Konečné Ovce": mc_df["Total Animals"].iloc[-1],
-                    "Pasture Health (End)": mc_df["Pasture_Health"].iloc[-1],
-                    "Pracnost (h)": mc_df["Labor Hours"].sum(),
-                    "Dny Sucha": mc_df["Is_Drought"].sum(),
-                    "Dny Zimy": mc_df["Is_Winter"].sum(),
-                    "Seno (Konec)": mc_df["Hay Stock"].iloc[-1]
-                }
-                # Add sensitivity inputs
-                summary_row.update(sens_log)
-                run_summaries.append(summary_row)
-                
-                # --- 2. QUARTERLY DATA (Pro časovou analýzu) ---
-                # Resample na kvartály (používáme 'M' a filtrujeme, pro kompatibilitu)
-                # Vezmeme poslední den v měsíci
-                monthly = mc_df.resample('M').last()
-                # Filtrujeme jen březen, červen, září, prosinec
-                quarterly = monthly[monthly.index.month.isin([3, 6, 9, 12])].copy()
-                
-                for date, row in quarterly.iterrows():
-                    q_label = f"{date.year} Q{(date.month-1)//3 + 1}"
-                    quarterly_data.append({
-                        "Scénář": sc_name,
-                        "Seed": current_seed,
-                        "Datum": date,
-                        "Kvartál": q_label,
-                        "Cash": row["Cash"],
-                        "Animals": row["Total Animals"],
-                        "BCS": row["BCS"],
-                        "Hay Stock": row["Hay Stock"],
-                        "Pasture Health": row["Pasture_Health"]
-                    })
-                
-                counter += 1
-                if counter % 10 == 0:
-                    progress_bar.progress(counter / total_sims)
-                    status_text.text(f"Simuluji: {sc_name} (Běh {i+1}/{n_runs})")
+                current_seed = run_seeds[i]
+                tasks.append((sc_name, run_kwargs, current_seed, sens_selection, sens_map, tuple(sens_factors[i])))
+                task_keys.append((sc_key, current_seed, tasks[-1][5]))
+        
+        # 2) Paralelní běh (ProcessPoolExecutor). Seed se nastavuje uvnitř workeru,
+        #    takže výsledky jsou pro daný seed deterministické bez ohledu na pořadí.
+        # OPTIMALIZACE: Do procesů posíláme jen běhy, které ještě nejsou v cache výsledků.
+        # Zásahy z cache si pod zámkem zkopírujeme do lokálního slovníku (results); jiná relace je
+        # pak nemůže zahodit dřív, než z nich sestavíme tabulky.
+        mc_cache, mc_cache_lock = _get_mc_result_cache()
+        results = {}
+        with mc_cache_lock:
+            for key in task_keys:
+                if key in mc_cache:
+                    results[key] = mc_cache[key]
+                    # Použitý záznam posuneme na konec, aby se zahazovaly ty nejdéle nepoužité
+                    mc_cache.move_to_end(key)
+        todo = [i for i, key in enumerate(task_keys) if key not in results]
+        # chunksize: posíláme úlohy po dávkách, aby režie mezi procesy nepřevážila samotnou simulaci.
+        chunksize = max(1, len(todo) // ((os.cpu_count() or 1) * 4))
+        # Dávky kvůli průběžnému ukazateli postupu
+        batch_size = chunksize * (os.cpu_count() or 1)
+        # OPTIMALIZACE: Souhrny zapisujeme do předem alokovaných typovaných polí (počet běhů známe),
+        # DataFrame pak vznikne přímo ze sloupců bez odvozování typů z listu dictů.
+        summary_cols = {col: np.empty(total_sims, dtype=dt) for col, dt in MC_SUMMARY_SCHEMA.items()}
+        for label in sens_selection:
+            summary_cols[label] = np.empty(total_sims, dtype=np.float64)
+        # Kvartální hodnoty stejně: počet kvartálů běhu je dán délkou simulace, takže
+        # pozice bloku každého běhu ve společné matici (q_offsets) známe předem.
+        q_info = [quarter_ends(t[1]["sim_years"] * 365) for t in tasks]
+        q_counts = np.array([len(q[0]) for q in q_info])
+        q_offsets = np.concatenate(([0], np.cumsum(q_counts)))
+        q_values = np.empty((q_offsets[-1], len(MC_QUARTERLY_COLS)), dtype=np.float32)
+        
+        executor = _get_mc_executor()
+        # OPTIMALIZACE: Průběh posíláme do prohlížeče nejvýš ~4x za sekundu (podle času, ne počtu běhů),
+        # každá zpráva totiž znamená překreslení frontendu.
+        last_ui = 0.0
+        for b in range(0, len(todo), batch_size):
+            batch = todo[b:b + batch_size]
+            batch_tasks = [tasks[i] for i in batch]
+            try:
+                batch_results = list(executor.map(run_mc_task, batch_tasks, chunksize=chunksize))
+            except BrokenProcessPool:
+                # Některý worker spadl (např. nedostatek paměti) a pool už nepřijme další úlohy.
+                # Vyměníme ho (jinak by selhalo každé další spuštění) a dávku zopakujeme v novém.
+                executor = _replace_broken_executor(executor)
+                try:
+                    batch_results = list(executor.map(run_mc_task, batch_tasks, chunksize=chunksize))
+                except BrokenProcessPool:
+                    # Opakované selhání už neřešíme dalším pokusem - pool vyměníme pro příští spuštění a skončíme.
+                    _replace_broken_executor(executor)
+                    progress_bar.empty()
+                    status.update(label="Simulace selhala.", state="error")
+                    st.error("Výpočetní proces simulace opakovaně spadl (např. nedostatek paměti). "
+                             "Zkuste menší počet běhů nebo scénářů a spusťte simulaci znovu.")
+                    st.stop()
+            for i, result in zip(batch, batch_results):
+                results[task_keys[i]] = result
+
+            counter = min(len(todo), b + batch_size)
+            now = time.time()
+            if now - last_ui > 0.25:
+                progress_bar.progress(counter / len(todo))
+                status.update(label=f"Simuluji: {tasks[batch[-1]][0]} (Běh {counter}/{len(todo)})")
+                last_ui = now
+
+        # Nové výsledky uložíme do sdílené cache a zahodíme nejdéle nepoužité záznamy nad limit.
+        with mc_cache_lock:
+            for i in todo:
+                mc_cache[task_keys[i]] = results[task_keys[i]]
+            while len(mc_cache) > MC_CACHE_MAX_ENTRIES:
+                mc_cache.popitem(last=False)
+        
+        # Výsledky (nové i z cache) zapíšeme v pořadí úloh z lokálního slovníku
+        for row_i, key in enumerate(task_keys):
+            summary_row, q_block = results[key]
+            for col, val in summary_row.items():
+                summary_cols[col][row_i] = val
+            q_values[q_offsets[row_i]:q_offsets[row_i + 1]] = q_block
         
         progress_bar.empty()
-        status_text.success(f"Hotovo! Simulováno {total_sims} běhů za {time.time()-start_time:.1f}s.")
+        status.update(label=f"Hotovo! Simulováno {len(todo)} z {total_sims} běhů (zbytek z cache) za {time.time()-start_time:.1f}s.", state="complete")
+        
+        # OPTIMALIZACE: Textové klíče (scénář, skupina, kvartál) ukládáme jako Categorical -
+        # porovnání a groupby pak pracují s celočíselnými kódy místo řetězců a session state je menší.
+        df_summary = pd.DataFrame(summary_cols).astype({"Scénář": "category", "Skupina": "category"})
+        # Kvartální DataFrame přímo ze sloupců: konstanty běhu (scénář, seed) opakujeme podle
+        # počtu kvartálů, data a popisky skládáme z předpočítaných quarter_ends.
+        df_quarterly = pd.DataFrame({
+            "Scénář": pd.Categorical(np.repeat(np.array([t[0] for t in tasks], dtype=object), q_counts)),
+            "Seed": np.repeat(np.array([t[2] for t in tasks], dtype=np.int64), q_counts),
+            "Datum": np.concatenate([q[1].values for q in q_info]),
+            "Kvartál": pd.Categorical(np.concatenate([q[2].to_numpy() for q in q_info]), ordered=True),
+            **{col: q_values[:, j] for j, col in enumerate(MC_QUARTERLY_COLS)}
+        })
         
-        # Uložení výsledků do session state pro persistenci při interakci s grafy
+        # OPTIMALIZACE: Pásma spolehlivosti počítáme hned z matice kvartálních hodnot, ne při
+        # zobrazení přes třídění/groupby celého df_quarterly. Běhy jednoho scénáře leží v q_values
+        # za sebou a mají stejný počet kvartálů, takže blok scénáře je jen reshape (běhy x kvartály x metriky).
+        ci_frames = []
+        for s_i, sc_name in enumerate(active_scenarios):
+            first = s_i * n_runs
+            block = q_values[q_offsets[first]:q_offsets[first + n_runs]].reshape(n_runs, q_counts[first], -1)
+            ci_frames.append(_ci_from_runs(sc_name, q_info[first][1], block))
+        df_ci = pd.concat(ci_frames, ignore_index=True)
+        
+        # Uložení výsledků do session state pro persistenci při interakci s grafy.
+        # Odvozené tabulky (pásma spolehlivosti, riziko) počítáme jednou zde, ne při každém překreslení.
         st.session_state['mc_results'] = {
-            'summary': pd.DataFrame(run_summaries),
-            'quarterly': pd.DataFrame(quarterly_data)
+            'summary': df_summary,
+            'quarterly': df_quarterly,
+            'ci': df_ci,
+            'risk': _risk_agg(df_summary),
+            # Seedy pro detailní graf (None = všechny běhy se vejdou)
+            'detail_seeds': (np.random.default_rng(0).choice(run_seeds, size=MAX_LINES_PER_SCENARIO, replace=False)
+                             if n_runs > MAX_LINES_PER_SCENARIO else None)
         }
         
-    # Pokud máme výsledky v paměti, zobrazíme je (i po restartu stránky)
-    if 'mc_results' in st.session_state:
-        # --- VIZUALIZACE VÝSLEDKŮ (ALTAIR) ---
-        # --- VISUALIZATION ---
-        df_summary = st.session_state['mc_results']['summary']
-        df_quarterly = st.session_state['mc_results']['quarterly']
-        
+    # --- VIZUALIZACE VÝSLEDKŮ (ALTAIR) ---
+    # @st.fragment: Při změně widgetu uvnitř (slicer kvartálu, režim zobrazení) se překreslí
+    # jen tato část, ne celý skript se všemi posuvníky v sidebaru.
+    @st.fragment
+    def _render_mc_results(mc_results, active_scenarios_pool, n_runs, sensitivity_on, sens_selection):
+        df_summary, df_quarterly = mc_results['summary'], mc_results['quarterly']
         # 1. SCENARIO DEFINITIONS TABLE
         st.subheader("Definice Scénářů")
         st.dataframe(pd.DataFrame(active_scenarios_pool).T)
@@ -406,14 +637,16 @@ if mode_switch == "Monte Carlo Laboratoř":
         st.subheader("Porovnání v čase (Slicer)")
         
         # Get unique quarters sorted
-        available_quarters = sorted(df_quarterly["Kvartál"].unique())
+        available_quarters = list(df_quarterly["Kvartál"].cat.categories)
         selected_q = st.select_slider("Vyberte období pro srovnání:", options=available_quarters, value=available_quarters[-1])
         
-        # Filter data for chart
+        # Filter data for chart (prostá maska nad Categorical kódy je levnější než hash celé tabulky pro cache)
         df_slice = df_quarterly[df_quarterly["Kvartál"] == selected_q]
         
+        # OPTIMALIZACE: Grafům předáváme jen sloupce, které kódují (x, y, barva, tooltip) -
+        # Altair serializuje celá data do JSON pro prohlížeč, zbytečné sloupce by jen zvětšily přenos.
         # Boxplot ukazuje rozdělení (medián, kvartily, extrémy).
-        chart_profit = alt.Chart(df_slice).mark_boxplot().encode(
+        chart_profit = alt.Chart(df_slice[["Scénář", "Cash", "BCS", "Animals"]]).mark_boxplot().encode(
             x=alt.X("Scénář:N", title=None),
             y=alt.Y("Cash:Q", title=f"Hotovost v {selected_q} (Kč)"),
             color="Scénář:N",
@@ -423,7 +656,7 @@ if mode_switch == "Monte Carlo Laboratoř":
         
         # 2b. EFFICIENCY CHART
         st.subheader("Pracovní Efektivita (Zisk na hodinu)")
-        chart_eff = alt.Chart(df_summary).mark_boxplot().encode(
+        chart_eff = alt.Chart(df_summary[["Scénář", "Skupina", "Efektivita (Kč/h)", "Zisk (Kč)", "Pracnost (h)"]]).mark_boxplot().encode(
             x=alt.X("Scénář:N", title=None),
             y=alt.Y("Efektivita (Kč/h):Q", title="Zisk na hodinu práce (Kč/h)"),
             color="Skupina:N",
@@ -434,13 +667,7 @@ if mode_switch == "Monte Carlo Laboratoř":
         # 3. RISK CHART (X = Sheep Count)
         # Scatter plot (bublinový graf) pro porovnání rizika a zisku.
         st.subheader("Risk vs Reward (Riziko vs Zisk)")
-        risk_agg = df_summary.groupby("Scénář").agg(
-            Riziko_Bankrotu=("Bankrot", "mean"),
-            Průměr_Min_BCS=("Min BCS", "mean"),
-            Průměr_Zisk=("Zisk (Kč)", "mean"),
-            Počet_Ovcí_Start=("Počet Ovcí (Start)", "first"), # Constant per scenario
-            Plocha=("Plocha (ha)", "first")
-        ).reset_index()
+        risk_agg = mc_results['risk']
         
         risk_chart = alt.Chart(risk_agg).mark_circle(opacity=0.8).encode(
             x=alt.X("Průměr_Zisk:Q", title="Průměrný Zisk (Kč)"),
@@ -459,87 +686,48 @@ if mode_switch == "Monte Carlo Laboratoř":
         ts_view_mode = st.radio("Režim zobrazení", ["Všechny běhy (Detail)", "Pásmo spolehlivosti (Agregace)"], horizontal=True)
         
         if ts_view_mode == "Všechny běhy (Detail)":
-            # Calculate opacity based on number of runs to avoid overplotting
-            opacity_val = max(0.05, min(0.8, 20.0 / n_runs))
-            selection = alt.selection_point(fields=['Scénář'], bind='legend')
-            
-            chart_cf = alt.Chart(df_quarterly).mark_line().encode(
-                x=alt.X("Datum:T", title="Čas"),
-                y=alt.Y("Cash:Q", title="Hotovost (Kč)"),
-                color="Scénář:N",
-                detail="Seed:N",
-                opacity=alt.condition(selection, alt.value(opacity_val), alt.value(0.005)),
-                tooltip=["Scénář", "Seed", "Datum", "Cash"]
-            ).add_params(selection).properties(title="Vývoj Cashflow (Všechny simulace)", height=300)
+            detail_seeds = mc_results['detail_seeds']
+            if detail_seeds is None:
+                df_plot = df_quarterly
+                n_lines = min(n_runs, MAX_LINES_PER_SCENARIO)
+            else:
+                df_plot = df_quarterly[df_quarterly["Seed"].isin(detail_seeds)]
+                n_lines = len(detail_seeds)
+            if n_runs > n_lines:
+                st.caption(f"Zobrazeno {n_lines} náhodně vybraných běhů z {n_runs} na scénář.")
             
-            chart_bcs = alt.Chart(df_quarterly).mark_line().encode(
-                x=alt.X("Datum:T", title="Čas"),
-                y=alt.Y("BCS:Q", title="BCS", scale=alt.Scale(domain=[1.5, 4.0])),
-                color="Scénář:N",
-                detail="Seed:N",
-                opacity=alt.condition(selection, alt.value(opacity_val), alt.value(0.005)),
-                tooltip=["Scénář", "Seed", "Datum", "BCS"]
-            ).add_params(selection).properties(title="Vývoj Kondice (BCS)", height=300)
+            # Calculate opacity based on number of runs to avoid overplotting
+            opacity_val = max(0.05, min(0.8, 20.0 / n_lines))
             
-            chart_pas = alt.Chart(df_quarterly).mark_line().encode(
-                x=alt.X("Datum:T", title="Čas"),
-                y=alt.Y("Pasture Health:Q", title="Zdraví Pastviny (0-1)"),
-                color="Scénář:N",
-                detail="Seed:N",
-                opacity=alt.condition(selection, alt.value(opacity_val), alt.value(0.005)),
-                tooltip=["Scénář", "Seed", "Datum", "Pasture Health"]
-            ).add_params(selection).properties(title="Degradace Pastviny", height=300)
+            chart_cf = _mc_runs_spec(df_plot, "Cash", "Hotovost (Kč)", "Vývoj Cashflow (Všechny simulace)", opacity_val)
+            chart_bcs = _mc_runs_spec(df_plot, "BCS", "BCS", "Vývoj Kondice (BCS)", opacity_val, y_scale={"domain": [1.5, 4.0]})
+            chart_pas = _mc_runs_spec(df_plot, "Pasture Health", "Zdraví Pastviny (0-1)", "Degradace Pastviny", opacity_val)
             
         else:
-            # Pásma spolehlivosti (Confidence Intervals)
-            # Confidence Interval Aggregation
-            ci_agg = df_quarterly.groupby(["Scénář", "Datum"]).agg(
-                Mean_Cash=("Cash", "mean"),
-                Min_Cash=("Cash", lambda x: x.quantile(0.05)),
-                Max_Cash=("Cash", lambda x: x.quantile(0.95)),
-                Mean_BCS=("BCS", "mean"),
-                Min_BCS=("BCS", lambda x: x.quantile(0.05)),
-                Max_BCS=("BCS", lambda x: x.quantile(0.95)),
-                Mean_Pas=("Pasture Health", "mean"),
-                Min_Pas=("Pasture Health", lambda x: x.quantile(0.05)),
-                Max_Pas=("Pasture Health", lambda x: x.quantile(0.95))
-            ).reset_index()
-            
-            def create_ci_chart(y_mean, y_min, y_max, title, y_title):
-                base = alt.Chart(ci_agg).encode(x=alt.X("Datum:T", title="Čas"), color="Scénář:N")
-                band = base.mark_area(opacity=0.3).encode(y=alt.Y(f"{y_min}:Q", title=y_title), y2=f"{y_max}:Q")
-                line = base.mark_line(size=3).encode(y=f"{y_mean}:Q")
-                return (band + line).properties(title=title, height=300)
-
-            chart_cf = create_ci_chart("Mean_Cash", "Min_Cash", "Max_Cash", "Vývoj Cashflow (Průměr + 90% Interval)", "Hotovost (Kč)")
-            chart_bcs = create_ci_chart("Mean_BCS", "Min_BCS", "Max_BCS", "Vývoj Kondice (BCS)", "BCS")
-            chart_pas = create_ci_chart("Mean_Pas", "Min_Pas", "Max_Pas", "Degradace Pastviny", "Zdraví Pastviny (0-1)")
+            # Pásma spolehlivosti (Confidence Intervals) - spočítaná už při simulaci (mc_results['ci'])
+            ci_agg = mc_results['ci']
+            chart_cf = _mc_ci_spec(ci_agg, "Mean_Cash", "Min_Cash", "Max_Cash", "Vývoj Cashflow (Průměr + 90% Interval)", "Hotovost (Kč)")
+            chart_bcs = _mc_ci_spec(ci_agg, "Mean_BCS", "Min_BCS", "Max_BCS", "Vývoj Kondice (BCS)", "BCS")
+            chart_pas = _mc_ci_spec(ci_agg, "Mean_Pas", "Min_Pas", "Max_Pas", "Degradace Pastviny", "Zdraví Pastviny (0-1)")
         
-        st.altair_chart(chart_cf, use_container_width=True)
+        st.vega_lite_chart(spec=chart_cf, use_container_width=True)
         
         col_ts1, col_ts2 = st.columns(2)
         with col_ts1:
-            st.altair_chart(chart_bcs, use_container_width=True)
+            st.vega_lite_chart(spec=chart_bcs, use_container_width=True)
             
         with col_ts2:
-            st.altair_chart(chart_pas, use_container_width=True)
+            st.vega_lite_chart(spec=chart_pas, use_container_width=True)
         
         # 4. SENSITIVITY ANALYSIS (Scatter)
         if sensitivity_on and sens_selection:
             st.subheader("Citlivostní Analýza (Korelace)")
             
-            # Create dynamic columns based on selection
-            cols = st.columns(min(len(sens_selection), 3))
-            
-            for i, label in enumerate(sens_selection):
-                with cols[i % 3]:
-                    chart_sens = alt.Chart(df_summary).mark_circle(size=60, opacity=0.5).encode(
-                        x=alt.X(f"{label}:Q", title=label, scale=alt.Scale(zero=False)),
-                        y=alt.Y("Zisk (Kč):Q", title="Zisk"),
-                        color="Skupina:N",
-                        tooltip=["Scénář", label, "Zisk (Kč)"]
-                    ).properties(title=f"Zisk vs. {label}")
-                    st.altair_chart(chart_sens, use_container_width=True)
+            # OPTIMALIZACE: Jeden graf s panely místo samostatného grafu pro každý parametr.
+            # Parametry, které v uložených výsledcích nejsou (citlivost zapnutá až po simulaci), vynecháme.
+            sens_labels = [label for label in sens_selection if label in df_summary.columns]
+            if sens_labels:
+                st.vega_lite_chart(spec=_sens_facet_spec(df_summary, sens_labels))
         
         # 4. DATA TABLES
         st.subheader("Souhrnné Výsledky (Průměry)")
@@ -552,96 +740,44 @@ if mode_switch == "Monte Carlo Laboratoř":
         with st.expander("Surová Data (Kvartální export)"):
             st.markdown("Data obsahují záznam pro každý Seed a každý Kvartál.")
             st.dataframe(df_quarterly)
-            st.download_button("Stáhnout CSV (Quarterly)", df_quarterly.to_csv(index=False).encode('utf-8'), "monte_carlo_quarterly.csv")
+            st.download_button("Stáhnout CSV (Quarterly)", lambda: _to_csv_bytes(df_quarterly), "monte_carlo_quarterly.csv", mime="text/csv")
             
         with st.expander("Surová Data (Souhrn běhu)"):
             st.markdown("Data obsahují jeden řádek pro každý Seed (finální výsledky).")
             st.dataframe(df_summary)
-            st.download_button("Stáhnout CSV (Summary)", df_summary.to_csv(index=False).encode('utf-8'), "monte_carlo_summary.csv")
-            
+            st.download_button("Stáhnout CSV (Summary)", lambda: _to_csv_bytes(df_summary), "monte_carlo_summary.csv", mime="text/csv")
+
+    # Pokud máme výsledky v paměti, zobrazíme je (i po restartu stránky)
+    if 'mc_results' in st.session_state:
+        _render_mc_results(st.session_state['mc_results'], active_scenarios_pool, n_runs, sensitivity_on, sens_selection)
+
     st.stop() # Stop execution here so standard dashboard doesn't render below
 
 # --- SPUŠTĚNÍ JEDNOTLIVÉ SIMULACE (STANDARDNÍ REŽIM) ---
 # --- RUN SIMULATION ---
-cfg = FarmConfig(
-    sim_years=5, 
-    land_area=area, 
-    meadow_share=meadow_pct/100.0, 
-    barn_capacity=target_ewes,
-    initial_ewes=start_ewes,
-    barn_area_m2=barn_m2,
-    hay_barn_area_m2=hay_barn_m2,
-    capital=cap,
-    price_meat_avg=meat_price, 
-    market_quota_kg=m_quota_kg,
-    price_meat_wholesale=m_wholesale,
-    delay_bcs_perception=delay_bcs,
-    delay_feed_delivery=delay_mat,
-    initial_hay_bales=start_hay,
-    include_labor_cost=labor_on,
-    climate_profile=climate,
-    machinery_mode=machinery,
-    rain_growth_global_mod=rain_mod,
-    drought_prob_add=drought_add,
-    winter_len_global_mod=winter_mod,
-    
-    # Overrides from advanced settings
-    fertility_mean=p_fertility,
-    mortality_lamb_mean=p_mortality_lamb,
-    mortality_ewe_mean=p_mortality_ewe,
-    feed_intake_ewe=p_feed_ewe,
-    hay_yield_ha_mean=p_hay_yield,
-    
-    cost_feed_own_mean=c_feed_own,
-    cost_feed_market_mean=c_feed_market,
-    cost_vet_base=c_vet,
-    cost_shearing=c_shearing,
-    price_ram_purchase=c_ram,
-    price_bale_sell_winter=c_bale_sell_winter,
-    price_bale_sell_summer=c_bale_sell_summer,
-    
-    service_mow_ha=s_mow_ha,
-    service_bale_pcs=s_bale,
-    own_machine_capex=o_capex,
-    own_mow_fuel_ha=o_fuel,
-    machinery_repair_mean=o_repair,
-    
-    subsidy_ha_mean=sub_ha,
-    subsidy_sheep_mean=sub_sheep,
-    tax_land_ha=tax_land,
-    tax_building_m2=tax_build,
-    
-    overhead_base_year=ov_base,
-    barn_maintenance_m2_year=maint_barn_m2,
-    admin_base_cost=adm_base,
-    admin_complexity_factor=adm_factor,
-    wage_hourly=wage,
-    labor_hours_per_ewe_year=labor_h,
-    labor_hours_per_ha_year=labor_ha,
-    labor_hours_fix_year=labor_fix, 
-    labor_hours_barn_m2_year=labor_barn_m2, 
-    shock_prob_daily=shock_p,
-    
-    # Sector 8
-    enable_freezing=use_freezing,
-    freezer_capacity_kg=p_freezer_cap,
-    freezer_capex=p_freezer_capex,
-    electricity_price=p_elec_price,
-    cooling_energy_per_kg=p_elec_usage
-)
-
-np.random.seed(sim_seed)
-model = FarmModel(cfg)
-df = model.run()
+cfg = FarmConfig(**base_kwargs)
+
+df, model = _run_single_sim(base_kwargs, sim_seed)
+
+# Výdajové sloupce modelu (Krmivo, Veterina+Seč, Administrativa, Režie, Práce, Šoky).
+EXP_COLS = ["Exp_Feed", "Exp_Variable", "Exp_Admin", "Exp_Overhead", "Exp_Labor", "Exp_Shock"]
+# OPTIMALIZACE: Výdaje vytáhneme jednou jako matici (dny x kategorie); součty za celé období
+# i denní čistý tok pak sdílí koláčový graf, cashflow, sezónní analýza i validace.
+exp_daily = df[EXP_COLS].to_numpy(dtype=float)
+exp_totals = pd.Series(exp_daily.sum(axis=0), index=EXP_COLS)
+net_daily = df["Income"].to_numpy(dtype=float) - exp_daily.sum(axis=1)
+# Datum jako sloupec pro Altair - jedna kopie sdílená všemi denními grafy.
+df_r = df.reset_index()
+# Týdenní hodnoty a jejich dlouhé tvary pro grafy (viz _weekly_views)
+df_weekly, df_herd_melt, bcs_melt = _weekly_views(base_kwargs, sim_seed)
 
 # --- SIDEBAR EXPORT ---
 with st.sidebar:
     st.markdown("---")
     st.header("💾 Export")
-    csv = df.to_csv().encode('utf-8')
     st.download_button(
         label="📥 Stáhnout data (CSV)",
-        data=csv,
+        data=lambda: _to_csv_bytes(df, index=True),
         file_name='farm_11_simulation.csv',
         mime='text/csv',
     )
@@ -659,39 +795,49 @@ total_profit = final_cash - cap
 avg_md_year = (df["Labor Hours"].sum() / cfg.sim_years) / 8.0
 
 # --- STICKY KPI ROW (FIXED POSITION) ---
-st.markdown(f"""
+# OPTIMALIZACE: Statická HTML šablona; při překreslení se jen dosadí předformátovaná čísla.
+_KPI_TPL = """
     <div style="position: fixed; top: 3.5rem; left: 21rem; right: 0; z-index: 999; background-color: #0e1117; padding: 0.5rem 2rem; border-bottom: 1px solid #262730; display: flex; justify-content: space-around; align-items: center; box-shadow: 0 4px 6px -1px rgba(0, 0, 0, 0.1); border-bottom-left-radius: 8px;">
         <div style="text-align: center;">
             <div style="font-size: 0.8rem; color: #fafafa; opacity: 0.8;">Hotovost</div>
-            <div style="font-size: 1.1rem; font-weight: bold; color: #2ecc71;">{final_cash:,.0f} Kč</div>
-            <div style="font-size: 0.7rem; color: {'#2ecc71' if total_profit >= 0 else '#e74c3c'};">{total_profit:+,.0f}</div>
+            <div style="font-size: 1.1rem; font-weight: bold; color: #2ecc71;">{cash} Kč</div>
+            <div style="font-size: 0.7rem; color: {profit_color};">{profit}</div>
         </div>
         <div style="text-align: center;">
             <div style="font-size: 0.8rem; color: #fafafa; opacity: 0.8;">Stav stáda</div>
-            <div style="font-size: 1.1rem; font-weight: bold; color: #fafafa;">{int(final_animals)}</div>
-            <div style="font-size: 0.7rem; color: #fafafa;">{int(final_animals - start_ewes):+d}</div>
+            <div style="font-size: 1.1rem; font-weight: bold; color: #fafafa;">{animals}</div>
+            <div style="font-size: 0.7rem; color: #fafafa;">{animals_delta}</div>
         </div>
         <div style="text-align: center;">
             <div style="font-size: 0.8rem; color: #fafafa; opacity: 0.8;">Seno</div>
-            <div style="font-size: 1.1rem; font-weight: bold; color: #f39c12;">{final_hay:.0f}</div>
+            <div style="font-size: 1.1rem; font-weight: bold; color: #f39c12;">{hay}</div>
         </div>
         <div style="text-align: center;">
             <div style="font-size: 0.8rem; color: #fafafa; opacity: 0.8;">ROI (Cash)</div>
-            <div style="font-size: 1.1rem; font-weight: bold; color: #fafafa;">{(total_profit/cap*100):.1f}%</div>
+            <div style="font-size: 1.1rem; font-weight: bold; color: #fafafa;">{roi}%</div>
         </div>
         <div style="text-align: center;">
             <div style="font-size: 0.8rem; color: #fafafa; opacity: 0.8;">Pracnost</div>
-            <div style="font-size: 1.1rem; font-weight: bold; color: #fafafa;">{avg_md_year:.1f} MD</div>
+            <div style="font-size: 1.1rem; font-weight: bold; color: #fafafa;">{labor_md} MD</div>
         </div>
     </div>
     <div style="height: 4rem;"></div> <!-- Spacer to prevent content overlap -->
-""", unsafe_allow_html=True)
+"""
+
+st.markdown(_KPI_TPL.format_map({
+    "cash": f"{final_cash:,.0f}",
+    "profit": f"{total_profit:+,.0f}",
+    "profit_color": "#2ecc71" if total_profit >= 0 else "#e74c3c",
+    "animals": int(final_animals),
+    "animals_delta": f"{int(final_animals - start_ewes):+d}",
+    "hay": f"{final_hay:.0f}",
+    "roi": f"{total_profit / cap * 100:.1f}",
+    "labor_md": f"{avg_md_year:.1f}"
+}), unsafe_allow_html=True)
 
 # --- 2. HERD STRUCTURE ---
 st.subheader("Struktura stáda (detailně)")
 
-df_herd_melt = df.reset_index().melt(id_vars='Date', value_vars=['Ewes', 'Lambs Male', 'Lambs Female'], var_name='Kategorie', value_name='Počet')
-
 herd_chart = alt.Chart(df_herd_melt).mark_area(opacity=0.7).encode(
     x=alt.X('Date:T', title='Datum'),
     y=alt.Y('Počet:Q', title='Počet zvířat', stack='zero'),
@@ -709,7 +855,7 @@ col_hay, col_meat = st.columns(2)
 
 with col_hay:
     st.markdown("**Seno (Balíky)**")
-    hay_chart = alt.Chart(df.reset_index()).mark_area(
+    hay_chart = alt.Chart(df_weekly).mark_area(
         line={'color':'#f39c12'},
         color=alt.Gradient(
             gradient='linear',
@@ -725,7 +871,7 @@ with col_hay:
 
 with col_meat:
     st.markdown("**Prodeje Masa (kg)**")
-    base = alt.Chart(df.reset_index()).encode(x=alt.X('Date:T', title='Datum'))
+    base = alt.Chart(df_r).encode(x=alt.X('Date:T', title='Datum'))
     
     fresh = base.mark_bar(color='#e74c3c').encode(
         y=alt.Y('Sold_Fresh_Kg:Q', title='Čerstvé (kg)', axis=alt.Axis(titleColor='#e74c3c')),
@@ -746,15 +892,27 @@ col_chart, col_pie = st.columns([3, 1])
 
 with col_chart:
     # Monthly aggregation for nicer chart
-    df_monthly = df.resample("M").sum()
-    df_monthly['Net Flow'] = df_monthly['Income'] - (df_monthly['Exp_Feed'] + df_monthly['Exp_Variable'] + df_monthly['Exp_Admin'] + df_monthly['Exp_Overhead'] + df_monthly['Exp_Labor'] + df_monthly['Exp_Shock'])
+    # OPTIMALIZACE: Měsíčně sčítáme jen sloupce, které graf používá (a denní čistý tok net_daily),
+    # ne celý denní DataFrame přes resample.
+    month_end = df.index + pd.offsets.MonthEnd(0)
+    monthly_cols = ["Income", "Inc_Meat", "Sold_Animals", "Inc_Hay", "Sold_Hay", "Inc_Subsidy"] + EXP_COLS
+    df_monthly = df[monthly_cols].assign(**{"Net Flow": net_daily}).groupby(month_end).sum()
+    df_monthly.index.name = "Date"
     df_monthly['Cumulative Cash'] = df_monthly['Net Flow'].cumsum() + cfg.capital
     
     # Výpočet průměrných cen pro tooltip (ošetření dělení nulou)
-    df_monthly['Avg_Meat_Price'] = df_monthly.apply(lambda x: x['Inc_Meat'] / x['Sold_Animals'] if x['Sold_Animals'] > 0 else 0, axis=1)
-    df_monthly['Avg_Hay_Price'] = df_monthly.apply(lambda x: x['Inc_Hay'] / x['Sold_Hay'] if x['Sold_Hay'] > 0 else 0, axis=1)
-
-    cash_flow_chart = alt.Chart(df_monthly.reset_index()).mark_bar().encode(
+    # OPTIMALIZACE: np.divide s where= dělí celý sloupec najednou; měsíce bez prodeje zůstanou 0
+    # (dříve apply s lambdou po jednotlivých řádcích).
+    inc_meat = df_monthly['Inc_Meat'].to_numpy(dtype=float)
+    sold_animals = df_monthly['Sold_Animals'].to_numpy(dtype=float)
+    df_monthly['Avg_Meat_Price'] = np.divide(inc_meat, sold_animals, out=np.zeros_like(inc_meat), where=sold_animals > 0)
+    inc_hay = df_monthly['Inc_Hay'].to_numpy(dtype=float)
+    sold_hay = df_monthly['Sold_Hay'].to_numpy(dtype=float)
+    df_monthly['Avg_Hay_Price'] = np.divide(inc_hay, sold_hay, out=np.zeros_like(inc_hay), where=sold_hay > 0)
+
+    df_monthly_r = df_monthly.reset_index()
+
+    cash_flow_chart = alt.Chart(df_monthly_r).mark_bar().encode(
         x=alt.X('Date:T', title='Měsíc'),
         y=alt.Y('Net Flow:Q', title='Měsíční Cashflow (Kč)'),
         color=alt.condition(
@@ -782,7 +940,7 @@ with col_chart:
         title='Měsíční čistý peněžní tok'
     )
 
-    cumulative_line = alt.Chart(df_monthly.reset_index()).mark_line(color='#3498db', size=3).encode(
+    cumulative_line = alt.Chart(df_monthly_r).mark_line(color='#3498db', size=3).encode(
         x=alt.X('Date:T'),
         y=alt.Y('Cumulative Cash:Q', title='Kumulativní hotovost (Kč)', axis=alt.Axis(orient='right')),
         tooltip=[alt.Tooltip('Date:T', title='Měsíc'), alt.Tooltip('Cumulative Cash:Q', title='Hotovost', format=',.0f')]
@@ -798,7 +956,7 @@ with col_pie:
     st.markdown("**Struktura nákladů**")
     source = pd.DataFrame({
         'Náklad': ['Krmivo', 'Veterina+Seč', 'Administrativa', 'Režie', 'Práce', 'Šoky'],
-        'Podíl': [df["Exp_Feed"].sum(), df["Exp_Variable"].sum(), df["Exp_Admin"].sum(), df["Exp_Overhead"].sum(), df["Exp_Labor"].sum(), df["Exp_Shock"].sum()]
+        'Podíl': exp_totals.to_numpy()
     })
 
     pie_chart = alt.Chart(source).mark_arc(innerRadius=50).encode(
@@ -817,14 +975,15 @@ st.subheader("Sezónní analýza")
 
 col_season, col_price = st.columns(2)
 
+# OPTIMALIZACE: Bez kopií celého denního DataFrame - měsíc bereme přímo z indexu
+# a denní tok je net_daily spočítaný u měsíčního cashflow.
+month = pd.Index(df.index.month, name="Month")
+
 with col_season:
     st.markdown("**Průměrný Denní Cashflow po Měsících**")
     
-    df_month = df.copy()
-    df_month["Month"] = df_month.index.month
-    df_month["Daily_Flow"] = df_month["Income"] - (df_month["Exp_Feed"] + df_month["Exp_Variable"] + df_month["Exp_Admin"] + df_month["Exp_Overhead"] + df_month["Exp_Labor"] + df_month["Exp_Shock"])
-    
-    seasonal = df_month.groupby("Month")["Daily_Flow"].mean()
+    seasonal = pd.Series(net_daily, name="Daily_Flow").groupby(month.to_numpy()).mean()
+    seasonal.index.name = "Month"
     seasonal_df = seasonal.reset_index()
     
     chart_seas = alt.Chart(seasonal_df).mark_bar().encode(
@@ -843,11 +1002,8 @@ with col_season:
 with col_price:
     st.markdown("**Volatilita ceny masa**")
     
-    df_price = df.copy()
-    df_price["Month"] = df_price.index.month
-    
     # Agregace pro boxplot tooltips
-    price_stats = df_price.groupby("Month")["Meat_Price"].describe().reset_index()
+    price_stats = df["Meat_Price"].groupby(month).describe().reset_index()
     
     base_price = alt.Chart(price_stats).encode(x=alt.X('Month:O', title='Měsíc'))
     
@@ -917,11 +1073,18 @@ with col_feed_chart:
     
     # --- FEEDING TIMELINE (New!) ---
     st.markdown("**Historie krmení**")
-    feed_timeline = alt.Chart(df.reset_index()).mark_bar().encode(
+    # OPTIMALIZACE: Týdenní agregace (týden x zdroj krmiva) místo denních pruhů -
+    # cca 7x méně dat i značek k vykreslení v prohlížeči.
+    feed_tl = df_r.groupby([pd.Grouper(key="Date", freq="W"), "Feed_Source"], observed=True).agg(
+        Exp_Feed=("Exp_Feed", "sum"),
+        Dny=("Exp_Feed", "size")
+    ).reset_index()
+    feed_timeline = alt.Chart(feed_tl).mark_bar().encode(
         x=alt.X('Date:T', title='Datum'),
         y=alt.Y('Feed_Source:N', title='Zdroj krmiva'),
         color=alt.Color('Feed_Source:N', legend=None),
-        tooltip=['Date:T', 'Feed_Source:N', alt.Tooltip('Exp_Feed:Q', title='Náklady (Kč)', format='.0f')]
+        tooltip=[alt.Tooltip('Date:T', title='Týden do'), 'Feed_Source:N', alt.Tooltip('Dny:Q', title='Dny'),
+                 alt.Tooltip('Exp_Feed:Q', title='Náklady (Kč)', format='.0f')]
     ).properties(
         height=150
     )
@@ -955,8 +1118,6 @@ with col_feed_info:
 # --- 6.b BCS EVOLUTION ---
 st.subheader("📉 Vývoj Kondice (BCS)")
 
-bcs_melt = df.reset_index().melt(id_vars='Date', value_vars=['BCS', 'Perceived_BCS'], var_name='Typ', value_name='Hodnota')
-
 bcs_chart = alt.Chart(bcs_melt).mark_line().encode(
     x=alt.X('Date:T', title='Datum'),
     y=alt.Y('Hodnota:Q', title='BCS (1-5)', scale=alt.Scale(domain=[1.5, 4.5])),
@@ -971,7 +1132,7 @@ st.caption("BCS ovlivňuje plodnost a mortalitu. Cíl je držet se v zelené zó
 # --- 6.c PASTURE HEALTH ---
 st.subheader("🌱 Zdraví Pastviny (Ekologická smyčka)")
 
-pasture_chart = alt.Chart(df.reset_index()).mark_area(
+pasture_chart = alt.Chart(df_weekly).mark_area(
     line={'color':'#27ae60'},
     color=alt.Gradient(
         gradient='linear',
@@ -993,7 +1154,7 @@ col_sim, col_theory = st.columns(2)
 
 with col_sim:
     st.markdown("**Vývoj v simulaci**")
-    base = alt.Chart(df.reset_index()).encode(x='Date:T')
+    base = alt.Chart(df_weekly).encode(x='Date:T')
     admin_line = base.mark_line(color='#e74c3c').encode(
         y=alt.Y('Exp_Admin:Q', title='Admin Náklady (Kč/den)', axis=alt.Axis(titleColor='#e74c3c')),
         tooltip=['Date:T', alt.Tooltip('Exp_Admin:Q', format=',.0f')]
@@ -1008,13 +1169,14 @@ with col_sim:
 with col_theory:
     st.markdown("**Teoretické křivky**")
     animals = np.arange(0, 501, 10)
-    factors = [1.0, 1.5, 2.0, 2.5, 3.0]
-    data = []
-    for factor in factors:
-        for n in animals:
-            cost = (cfg.admin_base_cost * (max(1, n) / 50.0) ** factor)
-            data.append({'Počet zvířat': n, 'Faktor': str(factor), 'Roční náklady': cost})
-    df_admin_comp = pd.DataFrame(data)
+    factors = np.array([1.0, 1.5, 2.0, 2.5, 3.0])
+    # OPTIMALIZACE: Celá mřížka (faktor x počet zvířat) jedním broadcastem místo dvojité smyčky.
+    costs = cfg.admin_base_cost * (np.maximum(1, animals)[None, :] / 50.0) ** factors[:, None]
+    df_admin_comp = pd.DataFrame({
+        'Počet zvířat': np.tile(animals, len(factors)),
+        'Faktor': np.repeat(factors.astype(str), len(animals)),
+        'Roční náklady': costs.ravel()
+    })
 
     theory_chart = alt.Chart(df_admin_comp).mark_line().encode(
         x=alt.X('Počet zvířat:Q'),
@@ -1029,7 +1191,7 @@ st.caption("Sledujte, jak náklady na administrativu (červená) rostou rychleji
 # --- 6.e WEATHER ANALYSIS ---
 st.subheader("🌤️ Analýza Počasí a Klimatu")
 
-weather_base = alt.Chart(df.reset_index()).encode(x=alt.X('Date:T', title='Datum'))
+weather_base = alt.Chart(df_r).encode(x=alt.X('Date:T', title='Datum'))
 
 # 1. Regime (Line)
 regime_line = weather_base.mark_line(color='#f1c40f').encode(
@@ -1090,14 +1252,14 @@ years = cfg.sim_years
 total_meat_income = df["Inc_Meat"].sum()
 total_hay_income = df["Inc_Hay"].sum()
 total_subsidy_income = df["Inc_Subsidy"].sum()
-total_expenses = df["Exp_Feed"].sum() + df["Exp_Variable"].sum() + df["Exp_Admin"].sum() + df["Exp_Overhead"].sum() + df["Exp_Labor"].sum() + df["Exp_Shock"].sum()
+total_expenses = exp_totals.sum()
 
-model_feed = df["Exp_Feed"].sum() / (avg_ewes * years)
+model_feed = exp_totals["Exp_Feed"] / (avg_ewes * years)
 
 # Rozdělení nákladů
 model_vet_services = (df["Exp_Vet"].sum() + df["Exp_Shearing"].sum() + df["Exp_RamPurchase"].sum()) / (avg_ewes * years)
-model_overhead_admin = (df["Exp_Overhead"].sum() + df["Exp_Admin"].sum() + df["Exp_Labor"].sum()) / (avg_ewes * years)
-model_machinery_ops = (df["Exp_Mow"].sum() + df["Exp_Machinery"].sum() + df["Exp_Shock"].sum()) / (avg_ewes * years)
+model_overhead_admin = (exp_totals["Exp_Overhead"] + exp_totals["Exp_Admin"] + exp_totals["Exp_Labor"]) / (avg_ewes * years)
+model_machinery_ops = (df["Exp_Mow"].sum() + df["Exp_Machinery"].sum() + exp_totals["Exp_Shock"]) / (avg_ewes * years)
 
 # Meat Income
 model_meat = total_meat_income / (avg_ewes * years)
@@ -1107,7 +1269,8 @@ model_meat = total_meat_income / (avg_ewes * years)
 model_profit_no_sub = (total_meat_income + total_hay_income - total_expenses) / (avg_ewes * years)
 
 # Odchov (použití existujícího sloupce Lambs)
-avg_lamb_peak = df[df.index.month == 6]["Lambs"].mean()
+# Měsíc dne bereme z pole month (sezónní analýza) - bez nového průchodu indexem a maskování celého df.
+avg_lamb_peak = df["Lambs"].to_numpy()[month == 6].mean()
 model_rearing = avg_lamb_peak / avg_ewes if avg_ewes > 0 else 0
 
 # Subsidy dependence
@@ -1115,15 +1278,17 @@ total_income = df["Income"].sum()
 model_subsidy_dep = (total_subsidy_income / total_income * 100) if total_income > 0 else 0
 
 # 3. Create comparison dataframe
+# Typovaná numpy pole; odchylka se spočítá jedním odečtením ještě před stavbou DataFrame.
+bench_vals = np.fromiter(benchmark_data.values(), dtype=np.float64, count=len(benchmark_data))
+model_vals = np.array([model_feed, model_vet_services, model_overhead_admin, model_machinery_ops, model_meat, model_profit_no_sub, model_rearing, model_subsidy_dep], dtype=np.float64)
 validation_df = pd.DataFrame({
     "Metrika": list(benchmark_data.keys()),
-    "Průměr ČR (Realita)": list(benchmark_data.values()),
-    "Tvůj Model": [model_feed, model_vet_services, model_overhead_admin, model_machinery_ops, model_meat, model_profit_no_sub, model_rearing, model_subsidy_dep]
+    "Průměr ČR (Realita)": bench_vals,
+    "Tvůj Model": model_vals,
+    # Calculate difference
+    "Odchylka": model_vals - bench_vals
 })
 
-# Calculate difference
-validation_df["Odchylka"] = validation_df["Tvůj Model"] - validation_df["Průměr ČR (Realita)"]
-
 # Display table
 st.markdown("###  Detailní Srovnání")
 st.dataframe(validation_df.style.format("{:,.0f}", subset=["Průměr ČR (Realita)", "Tvůj Model", "Odchylka"]), use_container_width=True, height=300)
@@ -1141,8 +1306,8 @@ if snapshot_dates:
         value=snapshot_dates[-1]
     )
     
-    snapshot_data = model.yearly_age_snapshots[selected_date]
-    df_age_snap = pd.DataFrame(snapshot_data)
+    snap_ages, snap_codes = model.yearly_age_snapshots[selected_date]
+    df_age_snap = pd.DataFrame({"Age": snap_ages, "Category": np.array(AGE_CATEGORIES, dtype=object)[snap_codes]})
     
     age_chart = alt.Chart(df_age_snap).mark_bar().encode(
         x=alt.X("Age:Q", bin=alt.Bin(step=1), title="Věk (roky)"),
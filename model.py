@@ -4,20 +4,76 @@
 # dataclasses: Pro snadnou definici tříd, které drží data (konfigurace).
 import numpy as np
 import pandas as pd
+from collections import ChainMap
 from dataclasses import dataclass, field
+from functools import lru_cache
 
 # --- HELPER FUNCTIONS ---
-def get_stochastic_value(mean, std, min_val=0.0):
+def get_stochastic_value(rng, mean, std, min_val=0.0, size=None):
     """
     Pomocná funkce pro generování náhodných čísel s normálním rozdělením (Gaussova křivka).
     Zajišťuje, že hodnota neklesne pod min_val (např. cena nemůže být záporná).
+    rng je numpy Generator daného modelu (np.random.default_rng).
+    S parametrem size vrátí rovnou numpy pole size hodnot (jedno volání generátoru místo cyklu).
     """
-    val = np.random.normal(mean, std)
+    if size is not None:
+        return np.maximum(min_val, rng.normal(mean, std, size))
+    val = rng.normal(mean, std)
     return max(min_val, val)
 
+# --- HISTORIE SIMULACE ---
+SIM_START = "2025-01-01" # První den simulace
+# Sloupce denní historie modelu (pořadí = pořadí sloupců ve výsledném DataFrame).
+H_COLS = ["Cash", "Ewes", "Lambs", "Lambs Male", "Lambs Female", "Total Animals", 
+          "Hay Stock", "Income", "Exp_Feed", "Exp_Vet", "Exp_Machinery", "Exp_Mow", 
+          "Exp_Shearing", "Exp_RamPurchase", "Exp_Admin", "Exp_Labor", "Labor Hours", 
+          "Exp_Overhead", "Exp_Shock", "Exp_Variable", "BCS", "Meat_Price", 
+          "Pasture_Health", "Perceived_BCS", "Weather_Regime", "Is_Winter", "Is_Drought",
+          "Inc_Meat", "Inc_Hay", "Inc_Subsidy", "Sold_Animals", "Sold_Hay", "Frozen_Stock",
+          "Sold_Fresh_Kg", "Sold_Frozen_Kg"]
+N_COLS = len(H_COLS)
+COL = {col: i for i, col in enumerate(H_COLS)}
+# Indexy sloupců jako celočíselné konstanty (rychlejší než COL["..."] uvnitř denního kroku)
+(COL_CASH, COL_EWES, COL_LAMBS, COL_LAMBS_MALE,
+ COL_LAMBS_FEMALE, COL_TOTAL_ANIMALS, COL_HAY_STOCK, COL_INCOME,
+ COL_EXP_FEED, COL_EXP_VET, COL_EXP_MACHINERY, COL_EXP_MOW,
+ COL_EXP_SHEARING, COL_EXP_RAMPURCHASE, COL_EXP_ADMIN, COL_EXP_LABOR,
+ COL_LABOR_HOURS, COL_EXP_OVERHEAD, COL_EXP_SHOCK, COL_EXP_VARIABLE,
+ COL_BCS, COL_MEAT_PRICE, COL_PASTURE_HEALTH, COL_PERCEIVED_BCS,
+ COL_WEATHER_REGIME, COL_IS_WINTER, COL_IS_DROUGHT, COL_INC_MEAT,
+ COL_INC_HAY, COL_INC_SUBSIDY, COL_SOLD_ANIMALS, COL_SOLD_HAY,
+ COL_FROZEN_STOCK, COL_SOLD_FRESH_KG, COL_SOLD_FROZEN_KG) = range(N_COLS)
+
+# --- ZDROJE KRMIVA ---
+# Zdroj krmiva dne ukládáme jako celočíselný kód (index do FEED_SOURCES), text se dosadí až ve výstupu.
+FEED_SOURCES = ["Pastva", "Seno", "Nákup", "Pastva + Seno", "Pastva + Hlad", "Pastva (Bez příkrmu)",
+                "Seno (Ochrana)", "Hladovění (Čekání)", "Hladovění (Bez sena)"]
+(FEED_GRAZING, FEED_HAY, FEED_MARKET, FEED_GRAZING_HAY, FEED_GRAZING_HUNGER,
+ FEED_GRAZING_ONLY, FEED_HAY_PROTECT, FEED_STARVING_WAIT, FEED_STARVING_NO_HAY) = range(len(FEED_SOURCES))
+
+# --- UDÁLOSTI (Deník farmáře) ---
+# OPTIMALIZACE: Model zapisuje událost jen jako (den, kód, parametry); text se skládá
+# až při zobrazení deníku (render_event_log), Monte Carlo běhy tak nic neformátují.
+EVENT_TEXTS = ["⚠️ Seník plný! Prodáno {} balíků.", "🌱 Jaro ({})", "❄️ Zima", "🚚 Dorazilo krmivo ({} balíků).",
+               "☀️ Sucho! Tráva neroste.", "🔧 Porucha traktoru! Oprava: {} Kč.",
+               "🐏 Připouštění. Březích: {} ks (BCS {:.2f}).", "✂️ Stříhání.", "🚜 Seč ({}). {} balíků.",
+               "🐏 Růst stáda -> nákup {} beranů.", "🐏 Výměna beranů.", "💰 Prodej. Příjem {}.", "⚡ Šok!"]
+(EVENT_BARN_FULL, EVENT_SPRING, EVENT_WINTER, EVENT_FEED_ARRIVAL, EVENT_DROUGHT, EVENT_BREAKDOWN,
+ EVENT_MATING, EVENT_SHEARING, EVENT_MOWING, EVENT_RAM_PURCHASE, EVENT_RAM_REPLACE,
+ EVENT_SALE, EVENT_SHOCK) = range(len(EVENT_TEXTS))
+
+# Kategorie zvířat ve snímcích věkové struktury (yearly_age_snapshots ukládá jejich kódy)
+AGE_CATEGORIES = ["Bahnice", "Berani", "Jehničky", "Beránci"]
+
+# Výchozí spotřeba chlazení mrazáku (kWh/kg/den); sdílí ji FarmConfig i vstup v aplikaci.
+# Se slots=True třída FarmConfig výchozí hodnoty polí jako atributy nenese.
+DEFAULT_COOLING_ENERGY_PER_KG = 0.015
+
 # @dataclass je dekorátor, který automaticky vygeneruje metodu __init__ a další.
 # Slouží jako "přepravka" pro konfigurační parametry farmy.
-@dataclass
+# OPTIMALIZACE: slots=True - instance bez __dict__, levnější vytvoření (v MC jedna na každý běh)
+# a o něco rychlejší čtení atributů cfg.* v kroku simulace.
+@dataclass(slots=True)
 class FarmConfig:
     # 1. SCALE & LAND
     sim_years: int
@@ -121,7 +177,7 @@ class FarmConfig:
     freezer_capacity_kg: float = 500.0 
     freezer_capex: float = 30000.0     
     electricity_price: float = 6.0     
-    cooling_energy_per_kg: float = 0.015 
+    cooling_energy_per_kg: float = DEFAULT_COOLING_ENERGY_PER_KG 
     
     # Sezónní poptávka (koeficienty prodejů masa v průběhu roku)
     seasonal_demand_factors: dict = field(default_factory=lambda: {
@@ -134,16 +190,21 @@ class FarmModel:
     """
     Hlavní třída modelu. Obsahuje stav farmy a logiku simulace.
     """
-    def __init__(self, cfg: FarmConfig):
+    def __init__(self, cfg: FarmConfig, seed=None):
         # Uložíme si konfiguraci do instance třídy (self.cfg)
         self.cfg = cfg
-        # Inicializace data simulace
-        self.date = pd.Timestamp("2025-01-01")
+        # OPTIMALIZACE: Vlastní generátor náhodných čísel modelu (PCG64) místo globálního np.random -
+        # rychlejší volání a běhy v různých procesech/vláknech nesdílí stav. Stejný seed = stejný běh.
+        self.rng = np.random.default_rng(seed)
+        # Index aktuálního dne simulace (datum se dohledá v self.dates jen pro logování)
+        self.t = 0
         
         # --- HERD ---
         self.ewes = cfg.initial_ewes
-        # OPTIMALIZACE: Věk jako numpy array pro vektorizaci
-        self.ewe_ages = np.random.uniform(1.0, 6.0, cfg.initial_ewes).astype(np.float32)
+        # OPTIMALIZACE: Místo věku držíme pro každou bahnici "den narození" (index dne, kdy by jí byl 0).
+        # Věk všech roste stejně, takže ho není třeba denně přičítat - dopočítá se jen při vyřazování,
+        # úmrtích a snímcích věkové struktury (viz _ewe_ages).
+        self.ewe_birth_t = -365.0 * self.rng.uniform(1.0, 6.0, cfg.initial_ewes)
         self.rams_breeding = max(1, int(cfg.initial_ewes / 30))
         self.ram_age = 3.0
         self.lambs_male = 0
@@ -156,9 +217,8 @@ class FarmModel:
         self.bcs = 3.0
         self.pasture_health = 1.0 # 1.0 = 100% zdravá pastvina, 0.0 = poušť
         self.perceived_bcs = 3.0  # To, co si farmář myslí, že je BCS (Informační zpoždění)
-        self.feed_orders = []     # Fronta objednávek: list of tuples (delivery_date, amount)
         self.pregnant_ewes = 0    # Počet březích bahnic (Gestační zpoždění)
-        self.yearly_age_snapshots = {} # Pro UI graf věkové struktury v čase
+        self.yearly_age_snapshots = {} # Pro UI graf věkové struktury v čase: datum -> (věky, kódy kategorií)
         
         # --- SEKTOR 8 (Logistika/Mrazák) ---
         self.frozen_meat_kg = 0.0
@@ -203,34 +263,80 @@ class FarmModel:
         self.area_meadow = cfg.land_area * cfg.meadow_share
         self.area_pasture = cfg.land_area * (1 - cfg.meadow_share)
         
-        self.event_log = []
-        self.feed_log = {"Pastva": 0, "Seno": 0, "Nákup": 0}
+        # OPTIMALIZACE: Konstanty odvozené z konfigurace spočítáme jednou zde,
+        # místo aby se ve step() každý den znovu dopočítávaly z self.cfg.
+        total_m2 = cfg.barn_area_m2 + cfg.hay_barn_area_m2
+        self.daily_overhead_base = cfg.overhead_base_year / 365
+        self.daily_barn_maint = (total_m2 * cfg.barn_maintenance_m2_year) / 365 # Údržba budov (rozpočítaná na den)
+        self.daily_admin_base = cfg.admin_base_cost / 365
+        # Pracnost nezávislá na počtu zvířat (půda, budovy, fixní) - hodin za rok
+        self.labor_hours_fixed_year = (cfg.land_area * cfg.labor_hours_per_ha_year) + cfg.labor_hours_fix_year + (total_m2 * cfg.labor_hours_barn_m2_year)
+        self.yearly_tax = (cfg.land_area * cfg.tax_land_ha) + (total_m2 * cfg.tax_building_m2)
+        # Další denní konstanty: vnímání BCS, poptávka z mrazáku, riziko poruchy, odpisy, úmrtnost
+        self.perception_alpha = 1.0 / max(1, cfg.delay_bcs_perception)
+        self.daily_demand_base = cfg.market_quota_kg / 365.0
+        self.breakdown_prob = cfg.machinery_failure_prob_daily * cfg.land_area
+        self.daily_depreciation = (cfg.own_machine_capex / cfg.own_machine_life) / 365
+        self.mort_prob_ewe_daily = cfg.mortality_ewe_mean / 365
+        self.mort_prob_lamb_daily = cfg.mortality_lamb_mean / 365
+        
+        self.event_log = [] # Záznamy (den, kód EVENT_*, parametry textu)
+        self.feed_log = {"Pastva": 0, "Seno": 0, "Nákup": 0} # Počty dní podle zdroje krmiva (doplní run())
         
         # OPTIMALIZACE: Před-alokace historie (místo appendování dictů)
         # Vypočítáme celkový počet kroků (dní) simulace.
         self.total_steps = self.cfg.sim_years * 365
+        
+        # Fronta objednávek krmiva: pole balíků indexované dnem příjezdu (Materiálové zpoždění)
+        # OPTIMALIZACE: Zpoždění je pevné, objednávku tedy jen přičteme na index t + zpoždění
+        # a příjezd je čtení arrivals[t] - žádné filtrování seznamu a porovnávání Timestamp.
+        # Objednávka s nulovým zpožděním dorazí až další den (příjezdy se zpracují před objednáním).
+        self.order_delay = max(1, self.cfg.delay_feed_delivery)
+        self.arrivals = np.zeros(self.total_steps + self.order_delay + 1, dtype=np.float64)
         # Vytvoříme rozsah dat pro celou simulaci.
-        self.dates = pd.date_range(start="2025-01-01", periods=self.total_steps, freq="D")
+        # OPTIMALIZACE: Čisté numpy datetime64[D] místo pd.date_range; kalendářní údaje odvodíme
+        # celočíselnou aritmetikou nad daty zaokrouhlenými na měsíc a rok (bez DatetimeIndex accessorů).
+        start = np.datetime64(SIM_START)
+        self.dates = np.arange(start, start + self.total_steps, dtype="datetime64[D]")
+        month_starts = self.dates.astype("datetime64[M]")
+        year_starts = self.dates.astype("datetime64[Y]")
         # Předvypočítané kalendářní údaje pro rychlý přístup
-        self.months = self.dates.month.values
-        self.days = self.dates.day.values
-        self.day_of_years = self.dates.dayofyear.values
-        
-        # Numpy pole pro historii (mnohem rychlejší zápis)
-        # Místo abychom přidávali řádky do seznamu (což je pomalé), vytvoříme předem
-        # prázdná pole nul (np.zeros) a budeme do nich zapisovat podle indexu dne.
-        self.h_cols = ["Cash", "Ewes", "Lambs", "Lambs Male", "Lambs Female", "Total Animals", 
-                       "Hay Stock", "Income", "Exp_Feed", "Exp_Vet", "Exp_Machinery", "Exp_Mow", 
-                       "Exp_Shearing", "Exp_RamPurchase", "Exp_Admin", "Exp_Labor", "Labor Hours", 
-                       "Exp_Overhead", "Exp_Shock", "Exp_Variable", "BCS", "Meat_Price", 
-                       "Pasture_Health", "Perceived_BCS", "Weather_Regime", "Is_Winter", "Is_Drought",
-                       "Inc_Meat", "Inc_Hay", "Inc_Subsidy", "Sold_Animals", "Sold_Hay", "Frozen_Stock",
-                       "Sold_Fresh_Kg", "Sold_Frozen_Kg"]
-        self.history_store = {col: np.zeros(self.total_steps, dtype=np.float32) for col in self.h_cols}
-        self.feed_source_store = [None] * self.total_steps
+        self.months = (month_starts.astype(np.int64) % 12 + 1).astype(np.int8)
+        self.days = ((self.dates - month_starts).astype(np.int64) + 1).astype(np.int8)
+        self.years = (year_starts.astype(np.int64) + 1970).astype(np.int16)
+        self.day_of_years = ((self.dates - year_starts).astype(np.int64) + 1).astype(np.int16)
+        
+        # OPTIMALIZACE: Veličiny nezávislé na stavu farmy (cena masa, šoky, sezónní režie)
+        # vylosujeme/spočítáme najednou pro celou simulaci; step() pak jen čte hodnotu dne t.
+        self.meat_price_arr = get_stochastic_value(self.rng, cfg.price_meat_avg, cfg.meat_price_std, size=self.total_steps)
+        self.meat_price_arr[np.isin(self.months, [3, 4])] *= 1.25 # Easter premium
+        self.shock_mask = self.rng.random(self.total_steps) < cfg.shock_prob_daily
+        self.shock_arr = np.where(self.shock_mask, get_stochastic_value(self.rng, cfg.shock_cost_mean, cfg.shock_cost_std, size=self.total_steps), 0.0)
+        # Režie: v létě (6-8) vyšší, jinak nižší + údržba budov rozpočítaná na den
+        self.daily_overhead_arr = (self.daily_overhead_base * np.where(np.isin(self.months, [6, 7, 8]), 1.5, 0.8)) + self.daily_barn_maint
+        
+        # OPTIMALIZACE: Denní náhodná čísla (přechody ročních období, sucho, porucha, šum počasí
+        # a poptávky) losujeme jedním voláním pro celou simulaci místo desítek skalárních volání
+        # generátoru každý den. Každý den má vlastní sadu, nepoužitá čísla se prostě zahodí.
+        self.u_spring, self.u_winter, self.u_drought, self.u_breakdown = self.rng.random((4, self.total_steps))
+        (self.z_weather, self.z_growth, self.z_avail,
+         self.z_demand, self.z_bale_price) = self.rng.standard_normal((5, self.total_steps))
+        
+        # Historie: jedna předalokovaná 2D matice (den x sloupec) ve float32.
+        # OPTIMALIZACE: Místo slovníku polí (35 hledání v dictu denně) zapisuje krok přímo do řádku
+        # dne v jedné souvislé matici; sloupce adresujeme konstantami COL_*.
+        self.history = np.zeros((self.total_steps, N_COLS), dtype=np.float32)
+        self.feed_source_store = np.zeros(self.total_steps, dtype=np.int8) # Kódy FEED_*
         
         # Grass curve (Month 1-12)
-        self.grass_curve = {1:0, 2:0, 3:0.1, 4:0.5, 5:1.2, 6:1.1, 7:0.8, 8:0.6, 9:0.8, 10:0.4, 11:0.1, 12:0}
+        # OPTIMALIZACE: Křivku růstu trávy rozbalíme na hodnotu pro každý den simulace,
+        # v kroku je pak jen indexace pole místo hledání ve slovníku podle měsíce.
+        grass_curve = np.array([0, 0, 0.1, 0.5, 1.2, 1.1, 0.8, 0.6, 0.8, 0.4, 0.1, 0])
+        self.grass_by_day = grass_curve[self.months - 1]
+
+    def _ewe_ages(self, t):
+        # Věk bahnic (roky) v kroku t; stárnutí o den se počítá už na začátku kroku, proto t + 1
+        return (t + 1 - self.ewe_birth_t) * (1 / 365.0)
 
     def _check_barn_capacity(self):
         max_volume = self.cfg.hay_barn_area_m2 * 3.0
@@ -240,26 +346,24 @@ class FarmModel:
             income = excess * self.cfg.price_bale_sell_summer
             # self.cash += income # Cash update moved to step() via income aggregation
             self.hay_stock_bales = max_bales
-            self.event_log.append(f"{self.date.date()}: ⚠️ Seník plný! Prodáno {int(excess)} balíků.")
+            self.event_log.append((self.t, EVENT_BARN_FULL, (int(excess),)))
             return income, excess
         return 0.0, 0.0
 
-    def _get_seasonal_overhead(self, month):
-        base = self.cfg.overhead_base_year / 365
-        # Add barn maintenance (spread daily)
-        total_m2 = self.cfg.barn_area_m2 + self.cfg.hay_barn_area_m2
-        barn_maint = (total_m2 * self.cfg.barn_maintenance_m2_year) / 365
-        return (base * (1.5 if month in [6,7,8] else 0.8)) + barn_maint
-
     def step(self, t):
         """
         Jeden krok simulace (jeden den).
         Parametr 't' je index dne (0, 1, 2...).
         """
+        # OPTIMALIZACE: Konfiguraci čteme přes lokální proměnnou (jeden lookup místo
+        # ~60 přístupů self.cfg.* v každém dni simulace).
+        cfg = self.cfg
         # OPTIMALIZACE: Použití předvypočítaných hodnot z numpy polí
-        self.date = self.dates[t] # Pro logování a kompatibilitu
+        # Kalendář čteme jako celá čísla; datum (self.dates[t]) se formátuje jen při zápisu do logu.
+        self.t = t
         month = self.months[t]
         day = self.day_of_years[t]
+        dom = self.days[t] # Den v měsíci
         
         # --- INITIALIZATION ---
         inc_meat = 0.0
@@ -282,30 +386,28 @@ class FarmModel:
         feed_cost = 0.0
         
         # --- AGING (COHORT DELAY) ---
-        # OPTIMALIZACE: Vektorové stárnutí
-        self.ewe_ages += (1/365.0)
+        # Bahnice stárnou implicitně přes ewe_birth_t (_ewe_ages), berani jedním číslem
         self.ram_age += (1/365.0)
         
         # --- 0. SYSTEM DYNAMICS: DELAYS ---
         # A) Informační zpoždění (Perception Delay)
         # Farmář nevidí aktuální BCS, ale "klouzavý průměr" za posledních X dní.
         # Exponential smoothing: New = Old + alpha * (Target - Old)
-        alpha = 1.0 / max(1, self.cfg.delay_bcs_perception)
+        alpha = self.perception_alpha
         self.perceived_bcs = (self.perceived_bcs * (1 - alpha)) + (self.bcs * alpha)
         
         # --- WEATHER REGIME UPDATE (Autocorrelation) ---
         if self.weather_timer <= 0:
             # Losujeme nové počasí na 5-10 dní (týdenní trend)
             # Generujeme číslo kolem 1.0 (např. 0.7 = suchý týden, 1.3 = mokrý týden)
-            self.weather_regime = np.random.normal(1.0, 0.25) 
+            self.weather_regime = 1.0 + 0.25 * self.z_weather[t]
             self.weather_regime = max(0.5, min(1.5, self.weather_regime)) # Omezení extrémů
-            self.weather_timer = np.random.randint(5, 10)
+            self.weather_timer = self.rng.integers(5, 10)
         
         self.weather_timer -= 1
         
         # 1. MEAT PRICE
-        base_meat_price = get_stochastic_value(self.cfg.price_meat_avg, self.cfg.meat_price_std)
-        if month in [3, 4]: base_meat_price *= 1.25 # Easter premium
+        base_meat_price = self.meat_price_arr[t] # Včetně velikonoční přirážky (březen, duben)
         
         # --- SEKTOR 8: LOGISTIKA ---
         
@@ -317,16 +419,16 @@ class FarmModel:
         # Náklady na chlazení
         # Pokud máme maso v mrazáku, platíme elektřinu.
         if self.frozen_meat_kg > 0:
-            daily_kwh = self.frozen_meat_kg * self.cfg.cooling_energy_per_kg
-            cost_elec = daily_kwh * self.cfg.electricity_price
+            daily_kwh = self.frozen_meat_kg * cfg.cooling_energy_per_kg
+            cost_elec = daily_kwh * cfg.electricity_price
             var_cost += cost_elec 
         
         # Průběžný prodej z mrazáku
         # Zákazníci chodí celý rok. Pokud máme zásoby, prodáváme.
         if self.frozen_meat_kg > 0:
-            base_demand = self.cfg.market_quota_kg / 365.0
-            season_factor = self.cfg.seasonal_demand_factors.get(month, 1.0)
-            todays_demand = get_stochastic_value(base_demand * season_factor, base_demand * 0.5)
+            base_demand = self.daily_demand_base
+            season_factor = cfg.seasonal_demand_factors.get(month, 1.0)
+            todays_demand = max(0.0, base_demand * season_factor + base_demand * 0.5 * self.z_demand[t])
             
             sold_kg = min(self.frozen_meat_kg, todays_demand)
             
@@ -335,7 +437,7 @@ class FarmModel:
                 premium_kg = min(sold_kg, self.quota_remaining_kg)
                 wholesale_kg = sold_kg - premium_kg
                 
-                revenue = (premium_kg * base_meat_price) + (wholesale_kg * self.cfg.price_meat_wholesale)
+                revenue = (premium_kg * base_meat_price) + (wholesale_kg * cfg.price_meat_wholesale)
                 self.frozen_meat_kg -= sold_kg
                 self.quota_remaining_kg = max(0, self.quota_remaining_kg - premium_kg)
                 inc_frozen_sales = revenue # Note: inc_frozen_sales variable needs to be added to income sum
@@ -344,30 +446,28 @@ class FarmModel:
 
         # 2. SEASON CONTROL
         if self.is_winter and day > self.winter_end_day:
-            if np.random.random() < 0.1: 
+            if self.u_spring[t] < 0.1: 
                 self.is_winter = False
-                self.event_log.append(f"{self.date.date()}: 🌱 Jaro ({self.cfg.climate_profile})")
+                self.event_log.append((t, EVENT_SPRING, (cfg.climate_profile,)))
         
         if not self.is_winter and day > self.winter_start_day:
-            if np.random.random() < 0.1:
+            if self.u_winter[t] < 0.1:
                 self.is_winter = True
-                self.winter_end_day = int(get_stochastic_value(80 * self.winter_len_mod, 10))
-                self.event_log.append(f"{self.date.date()}: ❄️ Zima")
+                self.winter_end_day = int(get_stochastic_value(self.rng, 80 * self.winter_len_mod, 10))
+                self.event_log.append((t, EVENT_WINTER, ()))
 
         # Process Feed Arrivals (Material Delay Resolution)
-        # Orders structure: list of {"date": Timestamp, "amount": float}
-        arrived_orders = [o for o in self.feed_orders if o["date"] <= self.date]
-        self.feed_orders = [o for o in self.feed_orders if o["date"] > self.date]
-        for order in arrived_orders:
-            self.hay_stock_bales += order["amount"]
-            self.event_log.append(f"{self.date.date()}: 🚚 Dorazilo krmivo ({int(order['amount'])} balíků).")
+        arrived = self.arrivals[t]
+        if arrived > 0:
+            self.hay_stock_bales += arrived
+            self.event_log.append((t, EVENT_FEED_ARRIVAL, (int(arrived),)))
 
         # 3. FEEDING & BCS
         total_adults = self.ewes + self.rams_breeding
         total_lambs = self.lambs_male + self.lambs_female
-        demand_kg = (total_adults * self.cfg.feed_intake_ewe) + (total_lambs * self.cfg.feed_intake_lamb)
+        demand_kg = (total_adults * cfg.feed_intake_ewe) + (total_lambs * cfg.feed_intake_lamb)
         
-        feed_source = ""
+        feed_source = FEED_HAY # Výchozí hodnota, každá větev krmení níže ji přepíše
         
         # Drought simulation
         is_drought = False
@@ -379,33 +479,32 @@ class FarmModel:
             elif self.weather_regime > 1.2:
                 current_drought_prob *= 0.1 # V deštivém týdnu sucho nehrozí
 
-            if np.random.random() < current_drought_prob:
+            if self.u_drought[t] < current_drought_prob:
                 is_drought = True
-                self.event_log.append(f"{self.date.date()}: ☀️ Sucho! Tráva neroste.")
+                self.event_log.append((t, EVENT_DROUGHT, ()))
 
         # --- FEEDING LOGIC WITH DELAYS ---
         # Automatické objednávání (Reorder Point)
         # Pokud zásoby klesnou pod 3 dny spotřeby, objednáme na týden dopředu.
-        daily_bales_needed = (demand_kg * 1.2) / self.cfg.bale_weight_kg
-        pending_bales = sum(o["amount"] for o in self.feed_orders)
+        daily_bales_needed = (demand_kg * 1.2) / cfg.bale_weight_kg
+        pending_bales = self.arrivals[t + 1:t + 1 + self.order_delay].sum()
         
         if (self.hay_stock_bales + pending_bales) < (daily_bales_needed * 3):
             # Objednáváme
             order_amount = daily_bales_needed * 7
-            delivery_date = self.date + pd.Timedelta(days=self.cfg.delay_feed_delivery)
-            cost = order_amount * get_stochastic_value(self.cfg.price_bale_sell_winter, 100)
+            cost = order_amount * max(0.0, cfg.price_bale_sell_winter + 100 * self.z_bale_price[t])
             
             if self.cash > cost:
                 self.cash -= cost
-                self.feed_orders.append({"date": delivery_date, "amount": order_amount})
-                # self.event_log.append(f"{self.date.date()}: 🛒 Objednáno krmivo (příjezd za {self.cfg.delay_feed_delivery} dny).")
+                self.arrivals[t + self.order_delay] += order_amount
+                # self.event_log.append(f"{self.dates[t]}: 🛒 Objednáno krmivo (příjezd za {cfg.delay_feed_delivery} dny).")
             else:
                 # Nemáme na to -> krizový management (prodej zvířat?) - zatím nic, prostě hlad
                 pass
 
         if self.is_winter or is_drought:
             # Feeding Hay
-            needed_bales = (demand_kg * 1.2) / self.cfg.bale_weight_kg # 20% waste
+            needed_bales = (demand_kg * 1.2) / cfg.bale_weight_kg # 20% waste
             fed = min(self.hay_stock_bales, needed_bales)
             self.hay_stock_bales -= fed
             feed_cost = fed * 50 # Handling
@@ -414,19 +513,19 @@ class FarmModel:
                 # DOŠLO KRMIVO A NOVÉ JEŠTĚ NEDORAZILO (Materiálové zpoždění)
                 # Ovce hladoví výrazněji
                 self.bcs = max(1.5, self.bcs - 0.005) # Hunger penalty
-                feed_source = "Hladovění (Čekání)"
+                feed_source = FEED_STARVING_WAIT
             else:
                 self.bcs = max(2.5, self.bcs - 0.001) # Maintenance
-                feed_source = "Seno"
+                feed_source = FEED_HAY
         else:
             # Grazing
-            growth = self.grass_curve[month] * self.grass_mod
+            growth = self.grass_by_day[t] * self.grass_mod
             # EKOLOGICKÁ SMYČKA: Růst závisí na zdraví pastviny
             growth *= self.pasture_health
             # AUTOKORELACE: Aplikace týdenního režimu + menší denní šum
-            growth *= self.weather_regime * np.random.normal(1.0, 0.1)
+            growth *= self.weather_regime * (1.0 + 0.1 * self.z_growth[t])
             
-            avail = self.area_pasture * 35.0 * growth * np.random.normal(1.0, 0.2)
+            avail = self.area_pasture * 35.0 * growth * (1.0 + 0.2 * self.z_avail[t])
             
             # --- PASTURE PROTECTION (Ochrana pastviny) ---
             # Pokud je zdraví kritické (< 50%) a máme seno, nepustíme ovce na pastvu (regenerace).
@@ -444,10 +543,10 @@ class FarmModel:
 
             # Update Pasture Health (Ecological Loop)
             if pressure > 0.95: # Ovce sežerou > 95% trávy -> degradace
-                damage = (pressure - 0.95) * self.cfg.pasture_degradation_rate
+                damage = (pressure - 0.95) * cfg.pasture_degradation_rate
                 self.pasture_health = max(0.1, self.pasture_health - damage)
             elif pressure < 0.5: # Pastvina odpočívá -> regenerace
-                self.pasture_health = min(1.0, self.pasture_health + self.cfg.pasture_recovery_rate)
+                self.pasture_health = min(1.0, self.pasture_health + cfg.pasture_recovery_rate)
 
             # Rozhodování o přikrmování na pastvě (Informační zpoždění)
             # Farmář se rozhoduje podle PERCEIVED BCS, ne podle skutečného.
@@ -460,11 +559,11 @@ class FarmModel:
             if eff_avail >= demand_kg:
                 self.bcs = min(4.0, self.bcs + 0.004)
                 feed_cost = demand_kg * 0.2 # Salt/Water
-                feed_source = "Pastva"
+                feed_source = FEED_GRAZING
             elif wants_to_supplement or force_hay:
                 # Supplement (Pokud farmář vidí potřebu NEBO je pastvina zavřená)
                 deficit = demand_kg - eff_avail
-                needed_bales = (deficit * 1.4) / self.cfg.bale_weight_kg
+                needed_bales = (deficit * 1.4) / cfg.bale_weight_kg
                 fed = min(self.hay_stock_bales, needed_bales)
                 self.hay_stock_bales -= fed
                 
@@ -473,38 +572,36 @@ class FarmModel:
                 if fed < needed_bales: 
                     # Došlo i seno na přikrmení
                     self.bcs -= 0.003
-                    feed_source = "Pastva + Hlad" if not force_hay else "Hladovění (Bez sena)"
+                    feed_source = FEED_GRAZING_HUNGER if not force_hay else FEED_STARVING_NO_HAY
                 else:
-                    feed_source = "Pastva + Seno" if not force_hay else "Seno (Ochrana)"
+                    feed_source = FEED_GRAZING_HAY if not force_hay else FEED_HAY_PROTECT
             else:
                 # Farmář si myslí, že jsou OK, tak nepřikrmuje, i když je málo trávy
                 # "Necháme je vyžrat nedopasky"
                 self.bcs -= 0.002 # Skutečná kondice klesá
-                feed_source = "Pastva (Bez příkrmu)"
+                feed_source = FEED_GRAZING_ONLY
         
-        self.feed_log[feed_source] = self.feed_log.get(feed_source, 0) + 1
 
         # 4. HEALTH & COSTS (BCS Impact)
         vet_multiplier = 1.0
         if self.bcs < 2.5: vet_multiplier = 2.0 # Nutná léčba
         
         # 5. MACHINERY COST (Make or Buy)
-        if self.cfg.machinery_mode == "Own":
-            # Depreciation (Odpisy)
-            daily_depreciation = (self.cfg.own_machine_capex / self.cfg.own_machine_life) / 365
-            # day_machinery += daily_depreciation # Odpisy nejsou cashflow výdaj, zde počítáme jen opravy
+        if cfg.machinery_mode == "Own":
+            # Depreciation (Odpisy) - self.daily_depreciation
+            # day_machinery += self.daily_depreciation # Odpisy nejsou cashflow výdaj, zde počítáme jen opravy
             
             # Breakdown risk (increases with land area used)
-            if np.random.random() < (self.cfg.machinery_failure_prob_daily * self.cfg.land_area):
-                repair = get_stochastic_value(self.cfg.machinery_repair_mean, self.cfg.machinery_repair_std)
+            if self.u_breakdown[t] < self.breakdown_prob:
+                repair = get_stochastic_value(self.rng, cfg.machinery_repair_mean, cfg.machinery_repair_std)
                 day_machinery += repair
-                self.event_log.append(f"{self.date.date()}: 🔧 Porucha traktoru! Oprava: {int(repair)} Kč.")
+                self.event_log.append((t, EVENT_BREAKDOWN, (int(repair),)))
 
         # 6. ADMIN PENALTY (Diseconomies of Scale)
         total_animals = total_adults + total_lambs
         # Power law: Base * (N/50)^1.5 ... costs grow faster than linearly
-        admin_scale = (max(1, total_animals) / 50.0) ** self.cfg.admin_complexity_factor
-        day_admin = (self.cfg.admin_base_cost * admin_scale) / 365
+        admin_scale = (max(1, total_animals) / 50.0) ** cfg.admin_complexity_factor
+        day_admin = self.daily_admin_base * admin_scale
 
         # --- EVENTS ---
         
@@ -512,10 +609,10 @@ class FarmModel:
         
         # 1. MATING (Říjen) - Začátek zpoždění
         # Rozhoduje se o potenciálu. Pokud jsou hubené TEĎ, v březnu jehňata nebudou.
-        if month == 10 and self.date.day == 1:
+        if month == 10 and dom == 1:
             conception_rate = 0.95 if self.bcs > 3.0 else (0.7 if self.bcs > 2.5 else 0.3)
             self.pregnant_ewes = int(self.ewes * conception_rate)
-            self.event_log.append(f"{self.date.date()}: 🐏 Připouštění. Březích: {self.pregnant_ewes} ks (BCS {self.bcs:.2f}).")
+            self.event_log.append((t, EVENT_MATING, (self.pregnant_ewes, self.bcs)))
 
         # 2. GESTATION RISK (Zima) - Průběh zpoždění
         # Pokud v zimě hladoví, potratí.
@@ -527,73 +624,72 @@ class FarmModel:
         # Rodí se to, co bylo počato v říjnu a přežilo zimu.
         if month == 3:
             # Denně rodí cca 1/30 ze zbývajících březích
-            born_today_mothers = np.random.binomial(self.pregnant_ewes, 0.1) 
+            born_today_mothers = self.rng.binomial(self.pregnant_ewes, 0.1) 
             if born_today_mothers > 0:
                 self.pregnant_ewes -= born_today_mothers
-                f = get_stochastic_value(self.cfg.fertility_mean, self.cfg.fertility_std)
+                f = get_stochastic_value(self.rng, cfg.fertility_mean, cfg.fertility_std)
                 new_lambs = int(born_today_mothers * f)
                 self.lambs_male += int(new_lambs / 2)
                 self.lambs_female += (new_lambs - int(new_lambs / 2))
                 self.bcs -= (born_today_mothers / max(1, self.ewes)) * 0.4 # Kojení vyčerpává
-                # self.event_log.append(f"{self.date.date()}: 🍼 Narozeno {new_lambs} jehňat.")
+                # self.event_log.append(f"{self.dates[t]}: 🍼 Narozeno {new_lambs} jehňat.")
 
         # Shearing
-        if month == 5 and self.date.day == 15:
-            day_shearing += total_adults * self.cfg.cost_shearing
-            self.event_log.append(f"{self.date.date()}: ✂️ Stříhání.")
+        if month == 5 and dom == 15:
+            day_shearing += total_adults * cfg.cost_shearing
+            self.event_log.append((t, EVENT_SHEARING, ()))
 
         # Mowing (June + Sept)
-        if (month == 6 or month == 9) and self.date.day == 10:
-            yield_h = get_stochastic_value(self.cfg.hay_yield_ha_mean, self.cfg.hay_yield_ha_std) * self.grass_mod * (0.6 if month==9 else 1.0)
+        if (month == 6 or month == 9) and dom == 10:
+            yield_h = get_stochastic_value(self.rng, cfg.hay_yield_ha_mean, cfg.hay_yield_ha_std) * self.grass_mod * (0.6 if month==9 else 1.0)
             bales = self.area_meadow * yield_h
             self.hay_stock_bales += bales
             
             # Cost calculation based on Mode
-            if self.cfg.machinery_mode == "Services":
-                cost = (self.area_meadow * self.cfg.service_mow_ha) + (bales * self.cfg.service_bale_pcs)
+            if cfg.machinery_mode == "Services":
+                cost = (self.area_meadow * cfg.service_mow_ha) + (bales * cfg.service_bale_pcs)
             else:
-                cost = (self.area_meadow * self.cfg.own_mow_fuel_ha) + (bales * self.cfg.own_bale_material)
+                cost = (self.area_meadow * cfg.own_mow_fuel_ha) + (bales * cfg.own_bale_material)
             
             day_mow += cost
             h_inc, h_qty = self._check_barn_capacity()
             inc_hay += h_inc
             sold_hay += h_qty
-            self.event_log.append(f"{self.date.date()}: 🚜 Seč ({self.cfg.machinery_mode}). {int(bales)} balíků.")
+            self.event_log.append((t, EVENT_MOWING, (cfg.machinery_mode, int(bales))))
 
         # Sales (October)
-        if month == 10 and self.date.day == 15:
+        if month == 10 and dom == 15:
             # TRŽNÍ SMYČKA: Tiered Pricing
             
             # 2. Renew Females (S respektem ke kapacitě ovčína)
             # CULLING LOGIC (Aging Chain Exit)
             # Vyřadíme ty, co jsou starší než limit (Pipeline exit)
-            # OPTIMALIZACE: Numpy maskování
-            old_mask = self.ewe_ages > self.cfg.max_ewe_age
-            old_indices = np.where(old_mask)[0]
+            # OPTIMALIZACE: Numpy maskování - jedna maska pro zachování, staré jen spočítáme
+            old_mask = self._ewe_ages(t) > cfg.max_ewe_age
+            n_old = np.count_nonzero(old_mask)
             
             # Pokud je starých málo, vyřadíme i nějaké náhodné (nemoc, úraz), abychom drželi 15% obnovu
             target_cull = int(self.ewes * 0.15)
-            needed_random_cull = max(0, target_cull - len(old_indices))
             
             # Vytvoříme masku pro zachování (True = nechat)
             keep_mask = ~old_mask
             
             # Náhodné vyřazení do počtu
-            candidates = np.where(keep_mask)[0]
-            needed_random_cull = min(len(candidates), needed_random_cull)
+            # OPTIMALIZACE: Generator.choice bez opakování nepermutuje celé stádo, vybere jen potřebný počet
+            candidates = np.flatnonzero(keep_mask)
+            needed_random_cull = min(candidates.size, max(0, target_cull - n_old))
             if needed_random_cull > 0:
-                random_culls = np.random.choice(candidates, needed_random_cull, replace=False)
-                keep_mask[random_culls] = False
+                keep_mask[self.rng.choice(candidates, needed_random_cull, replace=False)] = False
             
             # Aplikace vyřazení
-            self.ewe_ages = self.ewe_ages[keep_mask]
-            cull_count = self.ewes - len(self.ewe_ages)
-            self.ewes = len(self.ewe_ages) # Sync
+            self.ewe_birth_t = self.ewe_birth_t[keep_mask]
+            cull_count = self.ewes - len(self.ewe_birth_t)
+            self.ewes = len(self.ewe_birth_t) # Sync
             
             future_ewes = self.ewes
             
             # Kolik můžeme maximálně doplnit?
-            max_new_capacity = self.cfg.barn_capacity - future_ewes
+            max_new_capacity = cfg.barn_capacity - future_ewes
             
             # Chceme doplnit max. 80% jehniček, ale ne víc, než se vejde
             potential_keep = int(self.lambs_female * 0.8)
@@ -609,8 +705,8 @@ class FarmModel:
             to_freeze_kg = 0.0
             to_sell_fresh_kg = 0.0
             
-            if self.cfg.enable_freezing:
-                free_space = self.cfg.freezer_capacity_kg - self.frozen_meat_kg
+            if cfg.enable_freezing:
+                free_space = cfg.freezer_capacity_kg - self.frozen_meat_kg
                 to_freeze_kg = min(total_meat_kg, max(0, free_space))
                 to_sell_fresh_kg = total_meat_kg - to_freeze_kg
             else:
@@ -624,7 +720,7 @@ class FarmModel:
                 premium_kg = min(to_sell_fresh_kg, self.quota_remaining_kg)
                 cheap_kg = to_sell_fresh_kg - premium_kg
                 
-                revenue = (premium_kg * base_meat_price) + (cheap_kg * self.cfg.price_meat_wholesale)
+                revenue = (premium_kg * base_meat_price) + (cheap_kg * cfg.price_meat_wholesale)
                 inc_meat += revenue
                 self.quota_remaining_kg = max(0, self.quota_remaining_kg - premium_kg)
                 sold_fresh_kg = to_sell_fresh_kg
@@ -634,8 +730,8 @@ class FarmModel:
             
             # 3. Add kept lambs to herd (Pipeline Entry)
             # Jehničky vstupují do stáda ve věku cca 0.6 roku (7 měsíců)
-            self.ewe_ages = np.concatenate([self.ewe_ages, np.full(keep, 0.6)])
-            self.ewes = len(self.ewe_ages)
+            self.ewe_birth_t = np.concatenate([self.ewe_birth_t, np.full(keep, t + 1 - 0.6 * 365.0)])
+            self.ewes = len(self.ewe_birth_t)
             
             self.lambs_female = 0
             # Staré ovce jdou za nízkou cenu (živá váha cca 60kg * 25 Kč/kg - výkup/klobásy)
@@ -646,55 +742,52 @@ class FarmModel:
             needed_rams = max(1, int(self.ewes / 30))
             if self.rams_breeding < needed_rams:
                 buy_rams = needed_rams - self.rams_breeding
-                day_ram_purchase += buy_rams * self.cfg.price_ram_purchase
+                day_ram_purchase += buy_rams * cfg.price_ram_purchase
                 self.rams_breeding += buy_rams
-                self.event_log.append(f"{self.date.date()}: 🐏 Růst stáda -> nákup {buy_rams} beranů.")
+                self.event_log.append((t, EVENT_RAM_PURCHASE, (buy_rams,)))
             
             # 4. Ram Replace (every 2 years)
-            if self.date.year % 2 == 0:
+            if self.years[t] % 2 == 0:
                  replace_count = max(1, int(round(self.rams_breeding * 0.5)))
-                 cost = replace_count * self.cfg.price_ram_purchase
+                 cost = replace_count * cfg.price_ram_purchase
                  day_ram_purchase += cost
-                 self.event_log.append(f"🐏 Výměna beranů.")
+                 self.event_log.append((t, EVENT_RAM_REPLACE, ()))
                  self.ram_age = 2.0 # Omlazení beranů nákupem nových
 
             # 5. Fall Vet
-            day_vet += (self.ewes + self.rams_breeding) * (self.cfg.cost_vet_base * vet_multiplier / 2)
+            day_vet += (self.ewes + self.rams_breeding) * (cfg.cost_vet_base * vet_multiplier / 2)
             
-            self.event_log.append(f"{self.date.date()}: 💰 Prodej. Příjem {int(inc_meat + inc_hay)}.")
+            self.event_log.append((t, EVENT_SALE, (int(inc_meat + inc_hay),)))
 
         # Subsidies
-        if month == 11 and self.date.day == 20:
-            inc_subsidy += ((self.cfg.land_area * get_stochastic_value(self.cfg.subsidy_ha_mean, 200)) + (self.ewes * self.cfg.subsidy_sheep_mean)) * 0.7
-        if month == 4 and self.date.day == 20:
-             inc_subsidy += ((self.cfg.land_area * get_stochastic_value(self.cfg.subsidy_ha_mean, 200)) + (self.ewes * self.cfg.subsidy_sheep_mean)) * 0.3
+        if month == 11 and dom == 20:
+            inc_subsidy += ((cfg.land_area * get_stochastic_value(self.rng, cfg.subsidy_ha_mean, 200)) + (self.ewes * cfg.subsidy_sheep_mean)) * 0.7
+        if month == 4 and dom == 20:
+             inc_subsidy += ((cfg.land_area * get_stochastic_value(self.rng, cfg.subsidy_ha_mean, 200)) + (self.ewes * cfg.subsidy_sheep_mean)) * 0.3
         
         # Land Tax
-        if month == 12 and self.date.day == 31:
-             day_tax += self.cfg.land_area * self.cfg.tax_land_ha
-             day_tax += (self.cfg.barn_area_m2 + self.cfg.hay_barn_area_m2) * self.cfg.tax_building_m2
+        if month == 12 and dom == 31:
+             day_tax += self.yearly_tax
              var_cost += day_tax
 
         # Labor
-        labor_animals = total_adults * self.cfg.labor_hours_per_ewe_year
-        labor_land = self.cfg.land_area * self.cfg.labor_hours_per_ha_year
-        labor_barn = (self.cfg.barn_area_m2 + self.cfg.hay_barn_area_m2) * self.cfg.labor_hours_barn_m2_year
-        labor_fix = self.cfg.labor_hours_fix_year
+        labor_animals = total_adults * cfg.labor_hours_per_ewe_year
         
-        daily_hours = (labor_animals + labor_land + labor_fix + labor_barn) / 365
+        daily_hours = (labor_animals + self.labor_hours_fixed_year) / 365
         labor_val = 0
-        if self.cfg.include_labor_cost:
-            labor_val = daily_hours * self.cfg.wage_hourly
+        if cfg.include_labor_cost:
+            labor_val = daily_hours * cfg.wage_hourly
 
         # Shocks
-        shock_val = 0.0
-        if np.random.random() < self.cfg.shock_prob_daily:
-            shock_val = get_stochastic_value(self.cfg.shock_cost_mean, self.cfg.shock_cost_std)
-            self.event_log.append(f"{self.date.date()}: ⚡ Šok!")
+        shock_val = self.shock_arr[t]
+        if self.shock_mask[t]:
+            self.event_log.append((t, EVENT_SHOCK, ()))
 
         # Finalize
-        var_cost += day_vet + day_mow + day_shearing + day_ram_purchase + day_machinery + day_admin
-        daily_overhead = self._get_seasonal_overhead(month)
+        # OPTIMALIZACE: Součet variabilních nákladů spočítáme jednou - sdílí ho cash flow i historie (Exp_Variable)
+        day_variable = day_vet + day_mow + day_shearing + day_ram_purchase + day_machinery
+        var_cost += day_variable + day_admin
+        daily_overhead = self.daily_overhead_arr[t]
         income = inc_meat + inc_hay + inc_subsidy
         
         total_out = feed_cost + var_cost + daily_overhead + labor_val + shock_val
@@ -704,94 +797,238 @@ class FarmModel:
         self.bcs = max(1.0, min(5.0, self.bcs))
         
         # Mortality (Simple daily check)
-        mort_prob_ewe = (self.cfg.mortality_ewe_mean / 365)
+        mort_prob_ewe = self.mort_prob_ewe_daily
         if self.bcs < 2.0: mort_prob_ewe *= 5
         elif self.bcs < 2.5: mort_prob_ewe *= 2
         
-        deaths_ewes = np.random.binomial(self.ewes, mort_prob_ewe)
+        deaths_ewes = self.rng.binomial(self.ewes, mort_prob_ewe)
         
         # Uložení věkové struktury (každý měsíc)
-        if self.date.day == 1:
-            snapshot = []
-            # 1. Bahnice
-            for age in self.ewe_ages: # Iterace přes numpy array je ok pro snapshot jednou měsíčně
-                snapshot.append({"Age": age, "Category": "Bahnice"})
-            # 2. Berani
-            for _ in range(self.rams_breeding):
-                snapshot.append({"Age": self.ram_age, "Category": "Berani"})
-            # 3. Jehňata (cca věk podle data v roce)
-            l_age = max(0.0, (self.date.dayofyear - 75) / 365.0) if (self.lambs_male + self.lambs_female) > 0 else 0.0
-            for _ in range(self.lambs_female):
-                snapshot.append({"Age": l_age, "Category": "Jehničky"})
-            for _ in range(self.lambs_male):
-                snapshot.append({"Age": l_age, "Category": "Beránci"})
-            
-            self.yearly_age_snapshots[self.date] = snapshot
+        if dom == 1:
+            # OPTIMALIZACE: Snímek jsou dvě pole (věk, kód kategorie AGE_CATEGORIES) místo dictu na každé zvíře;
+            # tabulku z nich skládá až aplikace pro jedno vybrané datum.
+            # 1. Bahnice, 2. Berani, 3. Jehňata (cca věk podle data v roce)
+            l_age = max(0.0, (day - 75) / 365.0) if (self.lambs_male + self.lambs_female) > 0 else 0.0
+            ages = np.concatenate([self._ewe_ages(t), np.full(self.rams_breeding, self.ram_age),
+                                   np.full(self.lambs_female + self.lambs_male, l_age)])
+            codes = np.repeat(np.arange(len(AGE_CATEGORIES), dtype=np.int8),
+                              [len(self.ewe_birth_t), self.rams_breeding, self.lambs_female, self.lambs_male])
+            self.yearly_age_snapshots[pd.Timestamp(self.dates[t])] = (ages, codes)
         
         if deaths_ewes > 0 and self.ewes > 0:
             # Náhodně odstraníme z věkového seznamu (úhyn není závislý na věku v tomto zjednodušení)
-            death_indices = np.random.choice(len(self.ewe_ages), min(deaths_ewes, len(self.ewe_ages)), replace=False)
-            self.ewe_ages = np.delete(self.ewe_ages, death_indices)
-            self.ewes = len(self.ewe_ages)
+            death_indices = self.rng.choice(len(self.ewe_birth_t), min(deaths_ewes, len(self.ewe_birth_t)), replace=False)
+            # OPTIMALIZACE: Místo np.delete (nové pole a kopie celého stáda) přesuneme na místo uhynulé
+            # poslední bahnici a pole zkrátíme pohledem - práce úměrná počtu úhynů, ne velikosti stáda.
+            # Pořadí bahnic v poli nemá význam. Indexy bereme sestupně, takže konec pole je vždy živý.
+            ages = self.ewe_birth_t
+            n = len(ages)
+            for i in sorted(death_indices.tolist(), reverse=True):
+                n -= 1
+                ages[i] = ages[n]
+            self.ewe_birth_t = ages[:n]
+            self.ewes = n
         
         if self.lambs_male + self.lambs_female > 0:
-            mort_prob_lamb = (self.cfg.mortality_lamb_mean / 365) * (2 if self.bcs < 2.5 else 1)
-            self.lambs_male = max(0, self.lambs_male - np.random.binomial(self.lambs_male, mort_prob_lamb))
-            self.lambs_female = max(0, self.lambs_female - np.random.binomial(self.lambs_female, mort_prob_lamb))
-
-        # OPTIMALIZACE: Zápis do numpy polí místo appendování dictu
-        self.history_store["Cash"][t] = self.cash
-        self.history_store["Ewes"][t] = self.ewes
-        self.history_store["Lambs"][t] = self.lambs_male + self.lambs_female
-        self.history_store["Lambs Male"][t] = self.lambs_male
-        self.history_store["Lambs Female"][t] = self.lambs_female
-        self.history_store["Total Animals"][t] = self.ewes + self.rams_breeding + self.lambs_male + self.lambs_female
-        self.history_store["Hay Stock"][t] = self.hay_stock_bales
-        self.history_store["Income"][t] = income
-        self.history_store["Inc_Meat"][t] = inc_meat
-        self.history_store["Inc_Hay"][t] = inc_hay
-        self.history_store["Inc_Subsidy"][t] = inc_subsidy
-        self.history_store["Sold_Animals"][t] = sold_animals
-        self.history_store["Sold_Hay"][t] = sold_hay
-        self.history_store["Exp_Feed"][t] = feed_cost
-        self.history_store["Exp_Vet"][t] = day_vet
-        self.history_store["Exp_Machinery"][t] = day_machinery
-        self.history_store["Exp_Mow"][t] = day_mow
-        self.history_store["Exp_Shearing"][t] = day_shearing
-        self.history_store["Exp_RamPurchase"][t] = day_ram_purchase
-        self.history_store["Exp_Admin"][t] = day_admin
-        self.history_store["Exp_Labor"][t] = labor_val
-        self.history_store["Labor Hours"][t] = daily_hours
-        self.history_store["Exp_Overhead"][t] = daily_overhead + day_tax
-        self.history_store["Exp_Shock"][t] = shock_val
-        self.history_store["Exp_Variable"][t] = day_vet + day_mow + day_shearing + day_ram_purchase + day_machinery
-        self.history_store["BCS"][t] = self.bcs
-        self.history_store["Meat_Price"][t] = base_meat_price
-        self.history_store["Pasture_Health"][t] = self.pasture_health
-        self.history_store["Perceived_BCS"][t] = self.perceived_bcs
-        self.history_store["Weather_Regime"][t] = self.weather_regime
+            mort_prob_lamb = self.mort_prob_lamb_daily * (2 if self.bcs < 2.5 else 1)
+            self.lambs_male = max(0, self.lambs_male - self.rng.binomial(self.lambs_male, mort_prob_lamb))
+            self.lambs_female = max(0, self.lambs_female - self.rng.binomial(self.lambs_female, mort_prob_lamb))
+
+        # OPTIMALIZACE: Zapisujeme přímo do řádku dne v historii (row je pohled, ne kopie)
+        row = self.history[t]
+        row[COL_CASH] = self.cash
+        row[COL_EWES] = self.ewes
+        row[COL_LAMBS] = self.lambs_male + self.lambs_female
+        row[COL_LAMBS_MALE] = self.lambs_male
+        row[COL_LAMBS_FEMALE] = self.lambs_female
+        row[COL_TOTAL_ANIMALS] = self.ewes + self.rams_breeding + self.lambs_male + self.lambs_female
+        row[COL_HAY_STOCK] = self.hay_stock_bales
+        row[COL_INCOME] = income
+        row[COL_INC_MEAT] = inc_meat
+        row[COL_INC_HAY] = inc_hay
+        row[COL_INC_SUBSIDY] = inc_subsidy
+        row[COL_SOLD_ANIMALS] = sold_animals
+        row[COL_SOLD_HAY] = sold_hay
+        row[COL_EXP_FEED] = feed_cost
+        row[COL_EXP_VET] = day_vet
+        row[COL_EXP_MACHINERY] = day_machinery
+        row[COL_EXP_MOW] = day_mow
+        row[COL_EXP_SHEARING] = day_shearing
+        row[COL_EXP_RAMPURCHASE] = day_ram_purchase
+        row[COL_EXP_ADMIN] = day_admin
+        row[COL_EXP_LABOR] = labor_val
+        row[COL_LABOR_HOURS] = daily_hours
+        row[COL_EXP_OVERHEAD] = daily_overhead + day_tax
+        row[COL_EXP_SHOCK] = shock_val
+        row[COL_EXP_VARIABLE] = day_variable
+        row[COL_BCS] = self.bcs
+        row[COL_MEAT_PRICE] = base_meat_price
+        row[COL_PASTURE_HEALTH] = self.pasture_health
+        row[COL_PERCEIVED_BCS] = self.perceived_bcs
+        row[COL_WEATHER_REGIME] = self.weather_regime
         self.feed_source_store[t] = feed_source
-        self.history_store["Is_Winter"][t] = 1 if self.is_winter else 0
-        self.history_store["Is_Drought"][t] = 1 if is_drought else 0
-        self.history_store["Frozen_Stock"][t] = self.frozen_meat_kg
-        self.history_store["Sold_Fresh_Kg"][t] = sold_fresh_kg
-        self.history_store["Sold_Frozen_Kg"][t] = sold_frozen_kg
+        row[COL_IS_WINTER] = 1 if self.is_winter else 0
+        row[COL_IS_DROUGHT] = 1 if is_drought else 0
+        row[COL_FROZEN_STOCK] = self.frozen_meat_kg
+        row[COL_SOLD_FRESH_KG] = sold_fresh_kg
+        row[COL_SOLD_FROZEN_KG] = sold_frozen_kg
 
-    def run(self):
+    def render_event_log(self):
+        """
+        Převede záznamy deníku (den, kód, parametry) na čitelné řádky "datum: text".
+        """
+        return [f"{self.dates[t]}: {EVENT_TEXTS[code].format(*args)}" for t, code, args in self.event_log]
+
+    def simulate(self):
         """
-        Spustí simulaci pro všechny dny.
+        Spustí simulaci pro všechny dny. Výsledek zůstane v self.history (bez stavby DataFrame).
         """
         # OPTIMALIZACE: Cyklus přes indexy
         for t in range(self.total_steps): 
             self.step(t)
         
+        # OPTIMALIZACE: Počty dní podle zdroje krmiva spočítáme najednou z denních kódů
+        # (np.bincount) místo aktualizace slovníku v každém kroku.
+        counts = np.bincount(self.feed_source_store, minlength=len(FEED_SOURCES))
+        for name, n in zip(FEED_SOURCES, counts):
+            if n:
+                self.feed_log[name] = int(n)
+
+    def run(self):
+        """
+        Spustí simulaci pro všechny dny a vrátí denní DataFrame.
+        """
+        self.simulate()
+        
         # Vytvoření DataFrame až na konci z numpy polí
         # Pandas DataFrame vytvoříme až nakonec z naplněných numpy polí. Je to bleskurychlé.
-        df = pd.DataFrame(self.history_store, index=self.dates)
-        df["Feed_Source"] = self.feed_source_store
-        df.index.name = "Date"
+        index = pd.DatetimeIndex(self.dates.astype("datetime64[ns]"), freq="D", name="Date")
+        df = pd.DataFrame(self.history, columns=H_COLS, index=index)
+        # Zdroj krmiva jako Categorical přímo z kódů (bez převodu na pole řetězců)
+        df["Feed_Source"] = pd.Categorical.from_codes(self.feed_source_store, categories=FEED_SOURCES)
         return df
 
+# --- MONTE CARLO RUNNER ---
+# Sloupce historie, ze kterých se počítá souhrn a kvartální data běhu (pořadí = sloupce matice arr)
+MC_COLS = [COL_CASH, COL_LABOR_HOURS, COL_BCS, COL_TOTAL_ANIMALS, COL_PASTURE_HEALTH,
+           COL_IS_DROUGHT, COL_IS_WINTER, COL_HAY_STOCK]
+
+@lru_cache(maxsize=None)
+def quarter_ends(total_steps):
+    """
+    Pozice posledních dnů kvartálů (31.3., 30.6., 30.9., 31.12.) v denní historii, jejich data a popisky.
+    Poslední den simulace bereme vždy (přestupné roky -> 5*365 dní končí 30.12.); datem
+    je ale i u něj skutečný konec kvartálu (31.12.), stejně jako u dřívějšího měsíčního resample.
+    Závisí jen na délce simulace, proto se počítá jednou na proces a sdílí všemi běhy.
+    """
+    dates = pd.date_range(start=SIM_START, periods=total_steps, freq="D")
+    q_mask = dates.is_quarter_end
+    q_mask[-1] = True
+    # QuarterEnd(0) nechá konce kvartálů beze změny a jen posune vynucený poslední den
+    q_dates = dates[q_mask] + pd.offsets.QuarterEnd(0)
+    labels = q_dates.year.astype(str) + " Q" + q_dates.quarter.astype(str)
+    return np.flatnonzero(q_mask), q_dates, labels
+
+# Hodnotové sloupce kvartálních dat (název -> sloupec historie), v pořadí sloupců bloku z run_mc_task.
+MC_QUARTERLY_COLS = {
+    "Cash": COL_CASH, "Animals": COL_TOTAL_ANIMALS, "BCS": COL_BCS,
+    "Hay Stock": COL_HAY_STOCK, "Pasture Health": COL_PASTURE_HEALTH
+}
+
+# Sloupce a datové typy souhrnu jednoho běhu (klíče summary_row v run_mc_task).
+# Aplikace podle nich předem alokuje numpy pole o délce počtu běhů.
+# OPTIMALIZACE: Denní výstup modelu je float32, stejně tak většina souhrnů (polovina paměti
+# oproti float64); peníze a vstupní parametry necháváme ve float64, počty dní jako celá čísla.
+MC_SUMMARY_SCHEMA = {
+    "Scénář": object, "Skupina": object, "Seed": np.int64,
+    "Počet Ovcí (Start)": np.int32, "Plocha (ha)": np.float64,
+    "Zisk (Kč)": np.float64, "Efektivita (Kč/h)": np.float32, "Konečný Cash": np.float64,
+    "Bankrot": np.int8,
+    "Min BCS": np.float32, "Max BCS": np.float32, "Průměr BCS": np.float32,
+    "Konečné Ovce": np.float32, "Pasture Health (End)": np.float32,
+    "Pracnost (h)": np.float32, "Dny Sucha": np.int16, "Dny Zimy": np.int16,
+    "Seno (Konec)": np.float32
+}
+
+def run_mc_task(task):
+    """
+    Jeden běh Monte Carlo (dvojice scénář + seed).
+    Funkce je na úrovni modulu, aby ji šlo poslat do jiného procesu (ProcessPoolExecutor ji pickluje).
+    Vrací jen souhrnný řádek a kvartální blok hodnot (matice kvartály x MC_QUARTERLY_COLS),
+    ne celý denní DataFrame (méně dat mezi procesy). Data a popisky kvartálů doplní aplikace.
+    """
+    sc_name, run_kwargs, current_seed, sens_selection, sens_map, sens_factors = task
+
+    # Sensitivity Perturbation (Per Run)
+    # Faktory jsou předlosované v aplikaci (jedna matice pro všechny běhy), takže zde
+    # nespotřebováváme globální náhodu a model není potřeba znovu seedovat.
+    # OPTIMALIZACE: Místo kopie celého slovníku parametrů (~60 klíčů) zapisujeme změny jen do
+    # malé vrstvy nad ním (ChainMap); čtení jde přes vrstvu, pak do původních kwargs.
+    overlay = {}
+    current_run_kwargs = ChainMap(overlay, run_kwargs)
+    sens_log = {}
+
+    for label, factor in zip(sens_selection, sens_factors):
+        key = sens_map[label]
+
+        if key == "price_bale_sell_winter":
+            overlay["price_bale_sell_winter"] = current_run_kwargs["price_bale_sell_winter"] * factor
+            overlay["price_bale_sell_summer"] = current_run_kwargs["price_bale_sell_summer"] * factor
+            sens_log[label] = overlay["price_bale_sell_winter"]
+        else:
+            overlay[key] = current_run_kwargs[key] * factor
+            sens_log[label] = overlay[key]
+
+    mc_cfg = FarmConfig(**current_run_kwargs)
+    mc_model = FarmModel(mc_cfg, seed=current_seed)
+    # OPTIMALIZACE: Denní DataFrame běhu nestavíme - souhrn i kvartály čteme přímo z matice historie.
+    mc_model.simulate()
+
+    # --- 1. RUN SUMMARY (Agregace za celý běh) ---
+    # OPTIMALIZACE: Potřebné sloupce vytáhneme jednou jako numpy matici a statistiky
+    # počítáme nad pohledy na ni (žádné .iloc/.sum() přes pandas Series).
+    arr = mc_model.history[:, MC_COLS]
+    cash, labor, bcs = arr[:, 0], arr[:, 1], arr[:, 2]
+
+    final_cash = cash[-1]
+    profit = final_cash - mc_cfg.capital
+    is_bankrupt = 1 if final_cash < 0 else 0
+
+    total_labor = labor.sum()
+    efficiency = profit / max(1.0, total_labor)
+
+    summary_row = {
+        "Scénář": sc_name,
+        "Skupina": sc_name[0],
+        "Seed": current_seed,
+        "Počet Ovcí (Start)": mc_cfg.initial_ewes,
+        "Plocha (ha)": mc_cfg.land_area,
+        "Zisk (Kč)": profit,
+        "Efektivita (Kč/h)": efficiency,
+        "Konečný Cash": final_cash,
+        "Bankrot": is_bankrupt,
+        "Min BCS": bcs.min(),
+        "Max BCS": bcs.max(),
+        "Průměr BCS": bcs.mean(),
+        "Konečné Ovce": arr[-1, 3],
+        "Pasture Health (End)": arr[-1, 4],
+        "Pracnost (h)": total_labor,
+        "Dny Sucha": arr[:, 5].sum(),
+        "Dny Zimy": arr[:, 6].sum(),
+        "Seno (Konec)": arr[-1, 7]
+    }
+    # Add sensitivity inputs
+    summary_row.update(sens_log)
+
+    # --- 2. QUARTERLY DATA (Pro časovou analýzu) ---
+    # OPTIMALIZACE: Poslední dny kvartálů jsou pro danou délku simulace pevné pozice
+    # (quarter_ends, spočítané jednou) - vracíme jen typovaný blok hodnot vybraný přímo z historie.
+    # Scénář, seed, data a popisky kvartálů jsou pro běh konstantní, ty doplní aplikace sloupcově.
+    q_pos = quarter_ends(mc_model.total_steps)[0]
+    q_block = mc_model.history[np.ix_(q_pos, list(MC_QUARTERLY_COLS.values()))]
+
+    return summary_row, q_block
+
 # --- MONTE CARLO DEFINITIONS ---
 # 1. BASELINE (Výchozí hodnoty pro všechny scénáře - "Průměrná farma")
 BASE_SCENARIO = {